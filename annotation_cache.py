@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+job标注统计的本地缓存（SQLite）
+- 以 job_id + job列表中的 updated_date 为键，updated_date 没变的job直接用缓存
+- 只有标注被修改过的job才重新下载完整标注
+"""
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 与本地状态库（state_store.py）是同一个文件，sync.py 同步的标注统计各脚本直接可用
+DEFAULT_CACHE_PATH = 'logs/state.db'
+
+
+def open_annotation_cache(config):
+    """按config.json的cache配置打开缓存，未启用时返回None
+
+    配置示例:
+        "cache": {
+            "enabled": true,                          # 默认启用
+            "path": "logs/state.db"                   # 缓存文件位置（即本地状态库）
+        }
+    """
+    cache_config = (config or {}).get('cache', {}) or {}
+    if not cache_config.get('enabled', True):
+        return None
+
+    path = cache_config.get('path') or DEFAULT_CACHE_PATH
+    try:
+        return AnnotationCache(path)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  无法打开标注缓存 {path}: {e}，本次不使用缓存")
+        return None
+
+
+class AnnotationCache:
+    """job标注统计缓存（线程安全，扫描引擎的生产者线程读、主线程写）"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_summaries (
+                job_id INTEGER PRIMARY KEY,
+                updated_date TEXT NOT NULL,
+                start_frame INTEGER NOT NULL,
+                shapes INTEGER NOT NULL,
+                tracks INTEGER NOT NULL,
+                annotated_frames INTEGER NOT NULL,
+                frame_bitmap BLOB NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def get(self, job):
+        """返回缓存的标注统计；job不在缓存或updated_date已变化时返回None"""
+        updated_date = job.get('updated_date')
+        if not updated_date:
+            return None
+
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT updated_date, start_frame, shapes, tracks, annotated_frames, frame_bitmap '
+                'FROM job_summaries WHERE job_id = ?',
+                (job['id'],)
+            ).fetchone()
+
+        if row is None or row[0] != updated_date or row[1] != job.get('start_frame', 0):
+            return None
+        return {
+            'shapes': row[2],
+            'tracks': row[3],
+            'annotated_frames': row[4],
+            'frame_bitmap': int.from_bytes(row[5], 'little'),
+        }
+
+    def put_many(self, items):
+        """批量写入 [(job, summary), ...]，一个事务提交"""
+        rows = []
+        for job, summary in items:
+            updated_date = job.get('updated_date')
+            if not updated_date or summary is None:
+                continue
+            bitmap = summary.get('frame_bitmap', 0)
+            rows.append((
+                job['id'],
+                updated_date,
+                job.get('start_frame', 0),
+                summary['shapes'],
+                summary['tracks'],
+                summary['annotated_frames'],
+                bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little'),
+            ))
+
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO job_summaries '
+                '(job_id, updated_date, start_frame, shapes, tracks, annotated_frames, frame_bitmap) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+job标注覆盖探测 - check_annotation_status 需要知道job的哪些帧有标注（帧位图）
+按代价从低到高逐层判断，前面能确定的job不再下载完整标注：
+1. cache:    本地标注缓存（updated_date未变）
+2. report:   上一次状态报告记录的job帧位图（updated_date未变）
+3. download: 下载完整标注
+job列表元数据不能判断有无标注：导入标注的job的 updated_date 可能与 created_date 几乎相同。
+"""
+import json
+import logging
+from pathlib import Path
+
+from job_scanner import scan_tasks
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('cache', 'report', 'download')
+
+
+def encode_bitmap(bitmap):
+    """帧位图 → 报告中保存的十六进制字符串"""
+    return format(bitmap, 'x')
+
+
+def load_previous_jobs(log_dir):
+    """读取最近一次状态报告中的job结果 {job_id: (updated_date, 帧位图)}
+
+    旧版报告只记录了有无标注（true/false）：false 仍可用（位图为0），true 没有帧信息，需重新判断。
+    """
+    for report_file in sorted(Path(log_dir).glob('annotation_status_*.json'), reverse=True):
+        try:
+            with open(report_file, 'r', encoding='utf-8') as f:
+                jobs = json.load(f).get('jobs')
+        except (OSError, ValueError):
+            continue
+        if jobs is None:
+            continue
+
+        previous = {}
+        for job_id, (updated_date, value) in jobs.items():
+            if value is False:
+                previous[int(job_id)] = (updated_date, 0)
+            elif isinstance(value, str):
+                previous[int(job_id)] = (updated_date, int(value, 16))
+        return previous
+    return {}
+
+
+def probe_annotation_coverage(client, tasks, on_progress=None, organization_slug=None,
+                              cache=None, previous_jobs=None):
+    """逐层判断所有任务的jobs哪些帧有标注
+
+    Args:
+        client: BaseCVATClient 实例
+        tasks: 任务字典列表
+        on_progress: 可选回调 on_progress(completed, total)
+        organization_slug: 组织slug（任务较多时按组织一次列出jobs）
+        cache: 可选的 AnnotationCache，新下载的结果会写回
+        previous_jobs: load_previous_jobs() 的结果
+
+    Returns:
+        (task_jobs, coverage, tier_counts)
+        coverage: {job_id: 帧位图（第 i 位为 start_frame + i 帧，0表示没有标注），下载失败为None}
+        tier_counts: {层名: 由该层确定的jobs数}
+    """
+    tier_counts = dict.fromkeys(TIERS, 0)
+    previous_jobs = previous_jobs or {}
+
+    def resolve(job):
+        if cache:
+            summary = cache.get(job)
+            if summary is not None:
+                tier_counts['cache'] += 1
+                return summary['frame_bitmap']
+
+        previous = previous_jobs.get(job['id'])
+        if previous and job.get('updated_date') and previous[0] == job['updated_date']:
+            tier_counts['report'] += 1
+            return previous[1]
+
+        return None
+
+    task_jobs, results = scan_tasks(client, tasks, on_progress, organization_slug, resolve=resolve)
+
+    coverage = {}
+    downloaded = {}
+    for job_id, value in results.items():
+        if isinstance(value, dict):
+            downloaded[job_id] = value
+            coverage[job_id] = value['frame_bitmap']
+        else:
+            coverage[job_id] = value
+    tier_counts['download'] = len(results) - sum(tier_counts[tier] for tier in TIERS[:-1])
+
+    if cache and downloaded:
+        cache.put_many(
+            (job, downloaded[job['id']])
+            for jobs in task_jobs.values() for job in jobs
+            if job['id'] in downloaded
+        )
+
+    return task_jobs, coverage, tier_counts
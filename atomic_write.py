@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+原子写文件 - 报告先写到同目录的临时文件，写完再替换目标文件
+watch 模式持续刷新报告时，打开报告的人（或 run_workflow.sh 的 cat）不会读到写了一半的内容
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def atomic_open(path, mode='w', **kwargs):
+    """用法同 open()，with 块正常结束时用 os.replace 替换目标文件，出错时目标文件保持不变"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -9,14 +9,15 @@ import logging
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-try:
-    import boto3
-    from botocore.exceptions import ClientError, NoCredentialsError
-    HAS_BOTO3 = True
-except ImportError:
-    HAS_BOTO3 = False
+from cvat_client import BaseCVATClient, bitmap_frames
+from annotation_cache import open_annotation_cache
+from annotation_presence import TIERS, encode_bitmap, load_previous_jobs, probe_annotation_coverage
+from cloud_storage import (DEFAULT_FULL_LISTING_HOURS, DEFAULT_LIST_WORKERS, SessionAccumulator,
+                           list_cloud_inventory, stored_cloud_inventory)
+from path_index import PathIndex
+from state_store import get_excluded_tasks, load_state, open_state_store
+from status_report import MAX_CHUNK_FILES, details_file_of, write_details
 
 # 配置日志
 log_dir = Path('logs')
@@ -27,20 +28,18 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
     handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.FileHandler(log_file, encoding='utf-8', delay=True),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
 
-class CVATClient:
+class CVATClient(BaseCVATClient):
     """CVAT客户端"""
     
-    def __init__(self, base_url, api_key):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.headers = {'Authorization': f'Token {api_key}'}
+    def __init__(self, base_url, api_key, http_config=None):
+        super().__init__(base_url, api_key, http_config)
         logger.info(f"初始化CVAT客户端: {base_url}")
     
     def get_all_tasks(self, organization_slug=None):
@@ -50,22 +49,8 @@ class CVATClient:
         if organization_slug:
             params['org'] = organization_slug
         
-        all_tasks = []
-        page = 1
-        
         try:
-            while True:
-                params['page'] = page
-                response = requests.get(url, headers=self.headers, params=params, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                all_tasks.extend(results)
-                
-                if not data.get('next'):
-                    break
-                page += 1
+            all_tasks = list(self.iter_pages(url, params))
             
             logger.info(f"✅ 获取任务列表成功: {len(all_tasks)} 个任务")
             return all_tasks
@@ -78,7 +63,7 @@ class CVATClient:
         url = f'{self.base_url}/api/tasks/{task_id}/data/meta'
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self.get(url, timeout=30)
             response.raise_for_status()
             data = response.json()
             
@@ -93,40 +78,11 @@ class CVATClient:
     
     def get_task_jobs(self, task_id):
         """获取任务的所有jobs"""
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id, 'page_size': 1000}
-        
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            jobs_data = response.json()
-            jobs = jobs_data.get('results', [])
-            return jobs
+            return list(self.iter_task_jobs(task_id))
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ 获取jobs失败: task_id={task_id}, {e}")
             return []
-    
-    def get_job_has_annotations(self, job_id):
-        """检查job是否有标注（只检查数量，不获取全部数据）"""
-        url = f'{self.base_url}/api/jobs/{job_id}/annotations'
-        
-        try:
-            # 只获取第一页，检查是否有数据
-            response = requests.get(url, headers=self.headers, params={'page_size': 1}, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            # 检查是否有shapes或tracks
-            has_shapes = len(data.get('shapes', [])) > 0
-            has_tracks = len(data.get('tracks', [])) > 0
-            
-            return has_shapes or has_tracks
-        except requests.exceptions.Timeout:
-            logger.debug(f"检查job {job_id}超时")
-            return False
-        except requests.exceptions.RequestException as e:
-            logger.debug(f"检查job {job_id}失败: {e}")
-            return False
 
 
 def extract_chunk_id(filename):
@@ -161,97 +117,6 @@ def extract_chunk_id(filename):
     return 'unknown'
 
 
-def list_s3_files(bucket_name, prefix, aws_access_key_id=None, aws_secret_access_key=None, region_name='us-east-1', account_id=None):
-    """列举S3/R2存储桶中的文件
-    
-    Args:
-        bucket_name: S3 bucket名称
-        prefix: 文件路径前缀
-        aws_access_key_id: AWS Access Key ID
-        aws_secret_access_key: AWS Secret Access Key
-        region_name: AWS Region
-        account_id: Cloudflare R2 Account ID（如果使用R2）
-        
-    Returns:
-        文件路径列表，如果失败返回None
-    """
-    if not HAS_BOTO3:
-        logger.error("❌ boto3未安装，无法访问S3")
-        logger.info("💡 安装: pip install boto3")
-        return None
-    
-    try:
-        # 判断是否是Cloudflare R2
-        if account_id:
-            # Cloudflare R2 endpoint
-            endpoint_url = f'https://{account_id}.r2.cloudflarestorage.com'
-            logger.info(f"   使用Cloudflare R2: {endpoint_url}")
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=endpoint_url,
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-                region_name='auto'
-            )
-        else:
-            # 标准AWS S3
-            if aws_access_key_id and aws_secret_access_key:
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=aws_access_key_id,
-                    aws_secret_access_key=aws_secret_access_key,
-                    region_name=region_name
-                )
-            else:
-                # 使用默认凭证
-                s3_client = boto3.client('s3', region_name=region_name)
-        
-        logger.info(f"   正在列举文件: {bucket_name}/{prefix}")
-        
-        # 先列举根目录看看有什么
-        logger.info(f"   先检查根目录...")
-        try:
-            root_response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix='', MaxKeys=10)
-            if 'Contents' in root_response:
-                logger.info(f"   根目录示例文件:")
-                for obj in root_response['Contents'][:5]:
-                    logger.info(f"     - {obj['Key']}")
-        except Exception as e:
-            logger.warning(f"   无法列举根目录: {e}")
-        
-        # 列举对象
-        files = []
-        paginator = s3_client.get_paginator('list_objects_v2')
-        
-        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    # 只要文件，不要目录
-                    if not key.endswith('/'):
-                        files.append(key)
-                        # 动态显示扫描进度（终端原地刷新）
-                        print(f"\r   正在扫描... {len(files)} 个文件", end='', flush=True)
-        
-        # 换行，结束动态显示
-        print()
-        logger.info(f"✅ 找到 {len(files)} 个文件")
-        return files
-        
-    except NoCredentialsError:
-        logger.error("❌ AWS凭证未找到")
-        logger.info("💡 在config.json中配置s3部分")
-        return None
-    except ClientError as e:
-        logger.error(f"❌ S3访问失败: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"❌ 列举文件失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-
 def extract_basename(file_path):
     """提取文件基础名（去掉路径和hash前缀）"""
     basename = file_path.split('/')[-1]
@@ -260,12 +125,15 @@ def extract_basename(file_path):
     return basename
 
 
-def check_annotation_status(config_file='config.json', task_ids=None):
+def check_annotation_status(config_file='config.json', task_ids=None, offline=False, state=None):
     """核对标注状态主流程
     
     Args:
         config_file: 配置文件路径
         task_ids: 可选的任务ID列表，如果指定则只检查这些任务
+        offline: 不访问网络，任务、jobs、帧索引和云存储清单都只用本地状态库中已保存的
+                 （没有帧索引的任务跳过）
+        state: 可选，已同步好的数据（load_state/sync_state 的结果），提供时直接用其中的任务、jobs和标注统计
     """
     logger.info("="*60)
     logger.info("核对CVAT平台的标注状态")
@@ -293,74 +161,67 @@ def check_annotation_status(config_file='config.json', task_ids=None):
     region_name = s3_config.get('region', 'us-east-1')
     account_id = s3_config.get('account_id')  # Cloudflare R2 Account ID
     
-    # 2. 初始化CVAT客户端
-    cvat_client = CVATClient(cvat_url, api_key)
+    # 2. 初始化CVAT客户端（--offline 不访问网络）
+    cvat_client = None if offline else CVATClient(cvat_url, api_key, config.get('http'))
     
     # 3. 从S3/R2获取云存储文件列表
     cloud_basenames = None
     
+    # 云存储和CVAT的路径都编码为整数（同一个索引），集合只存整数，对比时做整数集合差
+    paths = PathIndex()
+    
     if bucket_name:
-        logger.info(f"\n📁 从云存储获取文件列表...")
+        if offline:
+            logger.info(f"\n💾 从本地状态库读取云存储清单（不访问网络）...")
+        else:
+            logger.info(f"\n📁 从云存储获取文件列表...")
         logger.info(f"   Bucket: {bucket_name}")
         logger.info(f"   Prefix: {prefix}")
         
-        s3_files = list_s3_files(
-            bucket_name=bucket_name,
-            prefix=prefix,
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-            region_name=region_name,
-            account_id=account_id
-        )
+        store = open_state_store(config)
+        if offline:
+            # 只用上次列举（python sync.py --cloud）保存的清单
+            s3_files = stored_cloud_inventory(store, bucket_name, prefix)
+        else:
+            # 增量列举：本地状态库中已完整的session不再重新列举
+            s3_files = list_cloud_inventory(
+                store,
+                bucket_name=bucket_name,
+                prefix=prefix,
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=region_name,
+                account_id=account_id,
+                workers=s3_config.get('list_workers', DEFAULT_LIST_WORKERS),
+                full_every_hours=s3_config.get('full_listing_hours', DEFAULT_FULL_LISTING_HOURS)
+            )
         
-        if s3_files:
-            # 按 session 分组文件，检查是否有 json 文件（标志 session 完整）
+        if s3_files is not None:
+            # 清单按key顺序流入session累积器：同一session的文件连续到达，
+            # 只有完整session（有 json 文件）的图片进入 cloud_files，内存不随存储桶大小增长
             logger.info(f"   检查 session 完整性（是否有 json 文件）...")
             
-            session_files = defaultdict(lambda: {'images': [], 'has_json': False})
-            
-            for file_path in s3_files:
-                # 提取 session ID
-                # 路径格式: b1e0/session_20260108_034622_359267/0000/down/labels/xxx/frame_00089.jpg
-                parts = file_path.split('/')
-                session_id = None
-                for part in parts:
-                    if part.startswith('session_'):
-                        session_id = part
-                        break
-                
-                if not session_id:
-                    continue
-                
-                # 检查是否是 json 文件
-                if file_path.endswith('.json'):
-                    session_files[session_id]['has_json'] = True
-                elif file_path.endswith('.jpg') or file_path.endswith('.png'):
-                    session_files[session_id]['images'].append(file_path)
-            
-            # 只保留有 json 文件的完整 session
-            complete_sessions = {sid: data for sid, data in session_files.items() if data['has_json']}
-            incomplete_sessions = {sid: data for sid, data in session_files.items() if not data['has_json']}
-            
-            logger.info(f"   完整 session: {len(complete_sessions)} 个")
-            logger.info(f"   不完整 session（无json）: {len(incomplete_sessions)} 个")
+            sessions = SessionAccumulator()
+            cloud_files = set(map(paths.encode, sessions.complete_images(s3_files)))
+        store.close()
+        
+        if s3_files is not None and sessions.total_files:
+            logger.info(f"   云存储文件: {sessions.total_files} 个")
+            logger.info(f"   完整 session: {sessions.complete_sessions} 个")
+            logger.info(f"   不完整 session（无json）: {len(sessions.incomplete_sessions)} 个")
             
-            if incomplete_sessions:
+            if sessions.incomplete_sessions:
                 logger.info(f"   不完整的 session 将被跳过:")
-                for sid in sorted(incomplete_sessions.keys())[:5]:
-                    img_count = len(incomplete_sessions[sid]['images'])
+                for sid in sorted(sessions.incomplete_sessions.keys())[:5]:
+                    img_count = sessions.incomplete_sessions[sid]
                     logger.info(f"      - {sid}: {img_count} 张图片（无json文件）")
-                if len(incomplete_sessions) > 5:
-                    logger.info(f"      ... 还有 {len(incomplete_sessions) - 5} 个")
-            
-            # 构建 cloud_files（完整路径集合，只包含完整 session 的图片）
-            cloud_files = set()
-            
-            for session_id, data in complete_sessions.items():
-                for file_path in data['images']:
-                    cloud_files.add(file_path)
+                if len(sessions.incomplete_sessions) > 5:
+                    logger.info(f"      ... 还有 {len(sessions.incomplete_sessions) - 5} 个")
             
             logger.info(f"✅ 云存储文件（完整session）: {len(cloud_files)} 个")
+        elif offline:
+            logger.warning("⚠️  本地状态库中没有云存储清单，请先运行: python sync.py --cloud")
+            cloud_files = None
         else:
             logger.warning("⚠️  无法从S3获取文件列表")
             cloud_files = None
@@ -370,37 +231,88 @@ def check_annotation_status(config_file='config.json', task_ids=None):
         cloud_files = None
     
     # 4. 获取CVAT中的所有任务和图片
-    logger.info(f"\n📋 获取CVAT任务列表...")
+    if state is None and offline:
+        store = open_state_store(config)
+        logger.info(f"\n💾 从本地状态库读取任务和jobs（不访问网络）: {store.path}")
+        state = load_state(store, task_ids, get_excluded_tasks(config))
+        store.close()
+        if not state['synced_at']:
+            logger.error("❌ 本地状态库为空，请先运行: python sync.py")
+            return
+        logger.info(f"   上次同步: {state['synced_at']}")
     
-    if task_ids:
-        # 使用指定的任务ID
-        tasks = []
-        for task_id in task_ids:
-            url = f'{cvat_url}/api/tasks/{task_id}'
-            try:
-                response = requests.get(url, headers={'Authorization': f'Token {api_key}'}, timeout=30)
-                response.raise_for_status()
-                tasks.append(response.json())
-            except Exception as e:
-                logger.error(f"❌ 获取任务失败: task_id={task_id}, {e}")
+    if state is not None:
+        tasks = state['tasks']
     else:
-        # 获取所有任务
-        tasks = cvat_client.get_all_tasks(organization_slug)
-    
-    # 排除旧平台任务
-    EXCLUDED_TASKS = {1967925}
-    tasks = [t for t in tasks if t['id'] not in EXCLUDED_TASKS]
+        logger.info(f"\n📋 获取CVAT任务列表...")
+        
+        if task_ids:
+            # 使用指定的任务ID
+            tasks = []
+            for task_id in task_ids:
+                try:
+                    tasks.append(cvat_client.get_task(task_id))
+                except Exception as e:
+                    logger.error(f"❌ 获取任务失败: task_id={task_id}, {e}")
+        else:
+            # 获取所有任务
+            tasks = cvat_client.get_all_tasks(organization_slug)
+        
+        # 排除旧平台任务（config.json 的 sync.excluded_tasks）
+        excluded = get_excluded_tasks(config)
+        tasks = [t for t in tasks if t['id'] not in excluded]
     
+    skipped_task_ids = []
     if not tasks:
         logger.warning("⚠️  未找到任何任务")
         cvat_images = set()
         cvat_annotated_images = set()
+        failed_job_ids = []
+        task_jobs, coverage, tier_counts = {}, {}, dict.fromkeys(TIERS, 0)
     else:
         logger.info(f"✅ 找到 {len(tasks)} 个任务")
         
         cvat_images = set()
         cvat_annotated_images = set()
         
+        if state is not None:
+            # 直接使用已同步的标注统计（都来自本地状态库），不再探测
+            task_jobs = state['task_jobs']
+            coverage = {
+                job_id: None if summary is None else summary['frame_bitmap']
+                for job_id, summary in state['summaries'].items()
+            }
+            tier_counts = dict.fromkeys(TIERS, 0)
+            tier_counts['cache'] = sum(bitmap is not None for bitmap in coverage.values())
+        else:
+            # 判断所有任务jobs哪些帧有标注：先用本地缓存、上次报告，无法确定的才下载标注
+            # （下载走全局队列，跨任务保持并发；并发数和引擎见 config.json 的 http 配置）
+            logger.info(f"\n🔍 检查标注状态（并发检查）...")
+            
+            def on_progress(completed, total):
+                if completed % 100 == 0:
+                    logger.info(f"      进度: {completed}/{total} jobs")
+            
+            task_jobs, coverage, tier_counts = probe_annotation_coverage(
+                cvat_client, tasks, on_progress, organization_slug,
+                cache=open_annotation_cache(config),
+                previous_jobs=load_previous_jobs(log_dir)
+            )
+        logger.info(f"✅ 已检查 {len(coverage)} 个jobs")
+        logger.info(f"   判断来源: 本地缓存 {tier_counts['cache']} | 上次报告 {tier_counts['report']} | "
+                    f"下载标注 {tier_counts['download']}")
+        
+        # 重试后仍失败的jobs：其帧既不算已标注也不能确定未标注，单独列出
+        failed_job_ids = sorted(job_id for job_id, bitmap in coverage.items() if bitmap is None)
+        if failed_job_ids:
+            logger.warning(f"⚠️  {len(failed_job_ids)} 个jobs获取标注失败（已重试）: {failed_job_ids[:50]}")
+        
+        # 帧索引（第 i 帧的文件名）：导入时已保存或之前获取过的任务直接使用，
+        # 其余任务（在别处创建的）从 data/meta 获取后保存，下次不再请求；--offline 时跳过这些任务
+        frames_store = open_state_store(config)
+        frame_index = frames_store.query_task_frames(task['id'] for task in tasks)
+        logger.info(f"\n📇 帧索引: {len(frame_index)}/{len(tasks)} 个任务已保存")
+        
         logger.info(f"\n📊 分析任务数据...")
         for idx, task in enumerate(tasks, 1):
             task_id = task['id']
@@ -408,79 +320,58 @@ def check_annotation_status(config_file='config.json', task_ids=None):
             
             logger.info(f"\n[{idx}/{len(tasks)}] 处理任务: {task_name} (ID: {task_id})")
             
-            # 获取任务图片列表（完整路径）
-            images = cvat_client.get_task_data(task_id)
-            image_paths = []
-            for img_path in images:
-                cvat_images.add(img_path)
-                image_paths.append(img_path)
+            # 获取任务图片列表（完整路径）；帧数与任务不一致的索引（数据未加载完时保存的）不使用
+            images = frame_index.get(task_id)
+            if (images is None or len(images) != task.get('size')) and offline:
+                logger.warning(f"   ⚠️  本地状态库中没有该任务的帧索引，跳过（在线运行一次后保存）")
+                skipped_task_ids.append(task_id)
+                continue
+            if images is None or len(images) != task.get('size'):
+                images = cvat_client.get_task_data(task_id)
+                if images and len(images) == task.get('size'):
+                    frames_store.put_task_frames(task_id, images, 'meta')
+            image_paths = [paths.encode(img_path) for img_path in images]
+            cvat_images.update(image_paths)
             
             logger.info(f"   → 图片数: {len(images)}")
             
-            # 获取任务的jobs
-            logger.info(f"   → 获取jobs...")
-            jobs = cvat_client.get_task_jobs(task_id)
+            jobs = task_jobs.get(task_id, [])
             logger.info(f"   → Jobs数: {len(jobs)}")
             
-            # 检查每个job是否有标注（并发执行）
-            logger.info(f"   → 检查标注状态（并发检查）...")
             annotated_job_count = 0
-            
-            # 准备检查任务
-            def check_job(job_info):
-                job_idx, job = job_info
-                job_id = job.get('id')
-                start_frame = job.get('start_frame', 0)
-                stop_frame = job.get('stop_frame', 0)
-                frame_count = stop_frame - start_frame + 1
-                
-                has_annotations = cvat_client.get_job_has_annotations(job_id)
-                
-                return {
-                    'job_idx': job_idx,
-                    'job_id': job_id,
-                    'start_frame': start_frame,
-                    'stop_frame': stop_frame,
-                    'frame_count': frame_count,
-                    'has_annotations': has_annotations
-                }
-            
-            # 并发检查（最多10个并发）
-            results = []
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {executor.submit(check_job, (idx, job)): idx for idx, job in enumerate(jobs, 1)}
-                
-                for future in as_completed(futures):
-                    result = future.result()
-                    results.append(result)
-                    
-                    # 显示进度
-                    if len(results) % 10 == 0 or len(results) == len(jobs):
-                        logger.info(f"      进度: {len(results)}/{len(jobs)} jobs")
-            
-            # 按job顺序排序结果
-            results.sort(key=lambda x: x['job_idx'])
-            
-            # 处理结果
-            for result in results:
-                if result['has_annotations']:
+            annotated_frame_count = 0
+            for job in jobs:
+                bitmap = coverage.get(job['id'])
+                if bitmap:
                     annotated_job_count += 1
-                    # 将这个job的所有帧标记为已标注
-                    for frame_idx in range(result['start_frame'], result['stop_frame'] + 1):
-                        if frame_idx < len(image_paths):
+                    # 只标记真正有标注的帧（帧位图中置位的帧），job里没画框的帧仍算未标注
+                    stop_frame = job.get('stop_frame', 0)
+                    for frame_idx in bitmap_frames(bitmap, job.get('start_frame', 0)):
+                        if frame_idx <= stop_frame and frame_idx < len(image_paths):
                             cvat_annotated_images.add(image_paths[frame_idx])
+                            annotated_frame_count += 1
             
-            logger.info(f"   ✓ 已标注jobs: {annotated_job_count}/{len(jobs)}")
+            logger.info(f"   ✓ 已标注jobs: {annotated_job_count}/{len(jobs)}，已标注帧: {annotated_frame_count}/{len(images)}")
+        frames_store.close()
         
         logger.info(f"\n✅ CVAT统计:")
         logger.info(f"   已加载图片: {len(cvat_images)} 个")
         logger.info(f"   已标注图片: {len(cvat_annotated_images)} 个")
     
+    if cvat_client is not None:
+        cvat_client.close()
+    
     # 5. 对比分析
     logger.info(f"\n🔍 分析结果...")
     
     loaded_not_annotated = cvat_images - cvat_annotated_images
     
+    if skipped_task_ids and cloud_files is not None:
+        # 跳过的任务中的图片会被误判为新数据（导入时重复），不做云存储对比
+        logger.warning(f"⚠️  {len(skipped_task_ids)} 个任务没有帧索引被跳过: {skipped_task_ids[:50]}")
+        logger.warning("   无法确定哪些是新数据，本次不与云存储对比（在线运行一次即可）")
+        cloud_files = None
+    
     if cloud_files is not None:
         # 有云存储数据，进行对比
         new_images = cloud_files - cvat_images
@@ -499,32 +390,35 @@ def check_annotation_status(config_file='config.json', task_ids=None):
                 'cvat_annotated': len(cvat_annotated_images),
                 'cvat_not_annotated': len(loaded_not_annotated),
                 'new_images': len(new_images),
+                'failed_jobs': len(failed_job_ids),
             },
-            'new_images': sorted(list(new_images)),
-            'annotated_images': sorted(list(cvat_annotated_images)),
-            'not_annotated_images': sorted(list(loaded_not_annotated)),
+        }
+        details = {
+            'new_images': paths.decode_sorted(new_images),
+            'annotated_images': paths.decode_sorted(cvat_annotated_images),
+            'not_annotated_images': paths.decode_sorted(loaded_not_annotated),
         }
         
-        # 生成新数据文件列表（按chunk分组，过滤超过2000张的chunk）
+        # 生成新数据文件列表（按chunk分组，过滤超过 MAX_CHUNK_FILES 张的chunk）
         if new_images:
             # 按chunk分组
             chunk_files = defaultdict(list)
             
-            for full_path in new_images:
+            for full_path in details['new_images']:
                 chunk_id = extract_chunk_id(full_path)
                 chunk_files[chunk_id].append(full_path)
             
-            # 过滤超过2000张的chunk
+            # 过滤超过 MAX_CHUNK_FILES 张的chunk
             valid_files = []
             skipped_chunks = []
             for chunk_id, files in chunk_files.items():
-                if len(files) > 2000:
+                if len(files) > MAX_CHUNK_FILES:
                     skipped_chunks.append((chunk_id, len(files)))
                 else:
                     valid_files.extend(files)
             
             if skipped_chunks:
-                logger.warning(f"\n⚠️  跳过 {len(skipped_chunks)} 个超大chunk（>2000张）:")
+                logger.warning(f"\n⚠️  跳过 {len(skipped_chunks)} 个超大chunk（>{MAX_CHUNK_FILES}张）:")
                 for chunk_id, count in skipped_chunks[:5]:
                     logger.warning(f"      - {chunk_id}: {count} 张")
                 if len(skipped_chunks) > 5:
@@ -540,7 +434,7 @@ def check_annotation_status(config_file='config.json', task_ids=None):
                 logger.info(f"   有效文件: {len(valid_files)} 个（来自 {len(chunk_files) - len(skipped_chunks)} 个chunk）")
                 logger.info(f"💡 下一步: 使用 import_new_data.py 导入新数据")
             else:
-                logger.warning(f"\n⚠️  所有chunk都超过2000张，没有可导入的数据")
+                logger.warning(f"\n⚠️  所有chunk都超过{MAX_CHUNK_FILES}张，没有可导入的数据")
     else:
         # 只有CVAT数据
         logger.info(f"\n📊 CVAT标注状态:")
@@ -553,18 +447,34 @@ def check_annotation_status(config_file='config.json', task_ids=None):
                 'cvat_total': len(cvat_images),
                 'cvat_annotated': len(cvat_annotated_images),
                 'cvat_not_annotated': len(loaded_not_annotated),
+                'failed_jobs': len(failed_job_ids),
             },
-            'annotated_images': sorted(list(cvat_annotated_images)),
-            'not_annotated_images': sorted(list(loaded_not_annotated)),
+        }
+        details = {
+            'annotated_images': paths.decode_sorted(cvat_annotated_images),
+            'not_annotated_images': paths.decode_sorted(loaded_not_annotated),
         }
     
     # 6. 保存结果
+    # 图片列表按chunk流式写到压缩明细文件，汇总文件只保存统计、chunk计数索引和job帧位图
     result_file = log_dir / f'annotation_status_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    details_file = details_file_of(result_file)
+    result['details'] = details_file.name
+    result['chunks'] = write_details(details_file, details, extract_chunk_id)
+    
+    # 记录每层判断了多少jobs，以及每个job的帧位图（十六进制，供下次运行的 report 层复用）
+    result['summary']['probe_tiers'] = tier_counts
+    result['jobs'] = {
+        job['id']: [job.get('updated_date'), encode_bitmap(coverage[job['id']])]
+        for jobs in task_jobs.values() for job in jobs
+        if coverage.get(job['id']) is not None and job.get('updated_date')
+    }
     
     with open(result_file, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+        json.dump(result, f, ensure_ascii=False)
     
     logger.info(f"\n✅ 结果已保存: {result_file}")
+    logger.info(f"   图片明细: {details_file}")
     
     logger.info(f"\n📝 日志文件: {log_file}")
     logger.info("="*60)
@@ -574,18 +484,22 @@ def main():
     """命令行入口"""
     import sys
     
+    args = sys.argv[1:]
+    offline = '--offline' in args
+    args = [arg for arg in args if arg != '--offline']
+    
     task_ids = None
-    if len(sys.argv) > 1:
+    if args:
         # 支持指定任务ID
         try:
-            task_ids = [int(tid) for tid in sys.argv[1:]]
+            task_ids = [int(tid) for tid in args]
             logger.info(f"检查指定任务: {task_ids}")
         except ValueError:
             logger.error("❌ 任务ID必须是数字")
-            logger.info("用法: python check_annotation_status.py [task_id1] [task_id2] ...")
+            logger.info("用法: python check_annotation_status.py [--offline] [task_id1] [task_id2] ...")
             return
     
-    check_annotation_status(task_ids=task_ids)
+    check_annotation_status(task_ids=task_ids, offline=offline)
 
 
 if __name__ == "__main__":
@@ -1,19 +1,28 @@
 #!/usr/bin/env python3
 """
 检查标注人员每日工作绩效
-- 记录每日快照
-- 计算今日产出
+- 每次运行的累计计数追加到绩效历史库（reports/performance_history.db）
+- 计算今日产出（或 --since 指定窗口内的产出）
 - 计算平均速度
 - 输出CSV报告
+
+用法:
+    python check_daily_performance.py                   # 今日产出（相对今天之前最近一次记录）
+    python check_daily_performance.py --since 7d        # 最近7天的产出
+    python check_daily_performance.py --offline 123     # 只统计指定任务，用本地状态库
 """
-import requests
 import json
 import logging
 import csv
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from atomic_write import atomic_open
+from cvat_client import BaseCVATClient
+from performance_history import (ACTIVE_SPEED_WINDOW, PerformanceHistory, parse_duration, record_state_samples,
+                                 task_scope)
+from state_store import get_excluded_tasks, get_sync_config, load_state, open_state_store, sync_state
 
 # 配置日志
 log_dir = Path('logs')
@@ -22,8 +31,8 @@ log_dir.mkdir(exist_ok=True)
 # 绩效报告目录
 report_dir = Path('reports')
 report_dir.mkdir(exist_ok=True)
+# 旧版每日快照目录，历史库为空时导入一次
 snapshot_dir = report_dir / 'snapshots'
-snapshot_dir.mkdir(exist_ok=True)
 
 log_file = log_dir / f'check_performance_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
 
@@ -31,129 +40,44 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
     handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.FileHandler(log_file, encoding='utf-8', delay=True),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
 
-class CVATClient:
-    """CVAT客户端"""
-    
-    def __init__(self, base_url, api_key):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.headers = {'Authorization': f'Token {api_key}'}
-    
-    def get_all_tasks(self, organization_slug=None):
-        """获取所有任务"""
-        url = f'{self.base_url}/api/tasks'
-        params = {'page_size': 500}
-        if organization_slug:
-            params['org'] = organization_slug
-        
-        all_tasks = []
-        page = 1
-        
-        try:
-            while True:
-                params['page'] = page
-                response = requests.get(url, headers=self.headers, params=params, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                all_tasks.extend(results)
-                
-                if not data.get('next'):
-                    break
-                page += 1
-            
-            return all_tasks
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 获取任务列表失败: {e}")
-            return []
-    
-    def get_task_jobs(self, task_id):
-        """获取任务的所有jobs"""
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id, 'page_size': 1000}
-        
-        try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            jobs_data = response.json()
-            return jobs_data.get('results', [])
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 获取jobs失败: task_id={task_id}, {e}")
-            return []
-    
-    def get_job_annotations(self, job_id):
-        """获取job的标注详情"""
-        url = f'{self.base_url}/api/jobs/{job_id}/annotations'
-        
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            shapes = data.get('shapes', [])
-            tracks = data.get('tracks', [])
-            
-            # 统计有标注的帧
-            annotated_frames = set()
-            for shape in shapes:
-                annotated_frames.add(shape.get('frame'))
-            for track in tracks:
-                for shape in track.get('shapes', []):
-                    annotated_frames.add(shape.get('frame'))
-            
-            return len(shapes), len(tracks), len(annotated_frames)
-        except requests.exceptions.RequestException as e:
-            logger.debug(f"获取标注失败: job_id={job_id}, {e}")
-            return 0, 0, 0
-    
-    def get_organization_members(self, organization_slug):
-        """获取组织成员列表"""
-        url = f'{self.base_url}/api/memberships'
-        params = {'org': organization_slug, 'page_size': 100}
-        
-        try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('results', [])
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 获取组织成员失败: {e}")
-            return []
 
+# 汇总CSV的列；没有增量基准时增量列留空（不再写 'N/A'，数值列保持数值类型）
+CSV_FIELDS = ['date', 'user', 'today_frames', 'total_annotated_frames', 'total_frames',
+              'today_shapes', 'total_shapes', 'completed_jobs', 'in_progress_jobs',
+              'total_jobs', 'avg_speed', 'active_hours', 'active_speed']
 
-def load_snapshot(date_str):
-    """加载指定日期的快照"""
-    snapshot_file = snapshot_dir / f'daily_{date_str}.json'
-    if snapshot_file.exists():
-        with open(snapshot_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return None
 
+def open_history():
+    """打开绩效历史库，首次使用时导入旧的每日快照"""
+    history = PerformanceHistory(report_dir / 'performance_history.db')
+    if history.count_runs() == 0 and snapshot_dir.exists():
+        imported = history.import_snapshots(snapshot_dir)
+        if imported:
+            logger.info(f"📥 已导入 {imported} 个旧的每日快照到绩效历史库")
+    return history
 
-def save_snapshot(date_str, data):
-    """保存快照"""
-    snapshot_file = snapshot_dir / f'daily_{date_str}.json'
-    with open(snapshot_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    logger.info(f"✅ 快照已保存: {snapshot_file}")
 
-
-def check_daily_performance(config_file='config.json', task_ids=None):
-    """检查每日绩效主流程"""
+def check_daily_performance(config_file='config.json', task_ids=None, offline=False, state=None, since=None,
+                            record=True):
+    """检查每日绩效主流程
+    
+    state: 可选，已同步好的数据（load_state/sync_state 的结果），提供时不再同步
+    since: 可选，增量窗口（timedelta）；默认相对今天0点之前最近的一次记录
+    record: 是否追加绩效历史和汇总CSV（watch 模式按间隔记录，其余轮次只刷新当天的CSV）
+    """
     logger.info("="*60)
     logger.info("检查标注人员每日绩效")
     logger.info("="*60)
     
-    today = datetime.now().strftime('%Y%m%d')
-    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
+    now = datetime.now()
+    today = now.strftime('%Y%m%d')
     
     # 1. 加载配置
     logger.info("\n📖 加载配置文件...")
@@ -168,29 +92,41 @@ def check_daily_performance(config_file='config.json', task_ids=None):
     api_key = config['cvat']['api_key']
     organization_slug = config.get('organization', {}).get('slug')
     
-    # 2. 初始化客户端
-    client = CVATClient(cvat_url, api_key)
-    logger.info(f"初始化CVAT客户端: {cvat_url}")
-    
-    # 3. 获取任务列表
-    logger.info(f"\n📋 获取任务列表...")
-    
-    if task_ids:
-        tasks = []
-        for task_id in task_ids:
-            url = f'{cvat_url}/api/tasks/{task_id}'
-            try:
-                response = requests.get(url, headers=client.headers, timeout=30)
-                response.raise_for_status()
-                tasks.append(response.json())
-            except Exception as e:
-                logger.error(f"❌ 获取任务失败: task_id={task_id}, {e}")
-    else:
-        tasks = client.get_all_tasks(organization_slug)
-    
-    # 排除旧平台任务
-    EXCLUDED_TASKS = {1967925}
-    tasks = [t for t in tasks if t['id'] not in EXCLUDED_TASKS]
+    # 2. 获取任务、jobs、成员和标注数据（在线时先同步到本地状态库，--offline 直接查询本地库）
+    if state is None:
+        store = open_state_store(config)
+        client = None
+        try:
+            if offline:
+                logger.info(f"\n💾 从本地状态库读取（不访问网络）: {store.path}")
+                state = load_state(store, task_ids, get_excluded_tasks(config))
+                if not state['synced_at']:
+                    logger.error("❌ 本地状态库为空，请先运行: python sync.py")
+                    return
+                logger.info(f"   上次同步: {state['synced_at']}")
+            else:
+                client = BaseCVATClient(cvat_url, api_key, config.get('http'))
+                logger.info(f"初始化CVAT客户端: {cvat_url}")
+                
+                logger.info(f"\n📊 收集标注数据...")
+                
+                def on_progress(completed, total):
+                    if completed % 10 == 0:
+                        print(f"\r   检查进度: {completed}/{total} jobs", end='', flush=True)
+                
+                state = sync_state(client, store, organization_slug, task_ids, get_excluded_tasks(config),
+                                   on_progress, **get_sync_config(config))
+                if state is None:
+                    return
+                print(f"\r   检查进度: {len(state['summaries'])}/{len(state['summaries'])} jobs")
+        finally:
+            store.close()
+            if client is not None:
+                client.close()
+    
+    tasks = state['tasks']
+    task_jobs = state['task_jobs']
+    summaries = state['summaries']
     
     if not tasks:
         logger.warning("⚠️  未找到任何任务")
@@ -198,17 +134,25 @@ def check_daily_performance(config_file='config.json', task_ids=None):
     
     logger.info(f"✅ 找到 {len(tasks)} 个任务")
     
-    # 4. 获取组织成员
-    members = client.get_organization_members(organization_slug) if organization_slug else []
     user_map = {}
-    for member in members:
+    for member in state['members']:
         user = member.get('user')
         if user:
             user_map[user.get('id')] = user.get('username')
     
-    # 5. 收集每个用户的数据
-    logger.info(f"\n📊 收集标注数据...")
+    # 重试后仍失败的jobs不计入统计（按0计会让今日增量出现负数）
+    job_annotations = {}
+    failed_job_ids = []
+    for job_id, summary in summaries.items():
+        if summary is None:
+            failed_job_ids.append(job_id)
+        else:
+            job_annotations[job_id] = summary
+    failed_job_ids.sort()
+    if failed_job_ids:
+        logger.warning(f"⚠️  {len(failed_job_ids)} 个jobs获取标注失败（已重试），不计入统计: {failed_job_ids[:50]}")
     
+    # 3. 收集每个用户的数据
     user_data = defaultdict(lambda: {
         'total_frames': 0,
         'annotated_frames': 0,
@@ -218,41 +162,15 @@ def check_daily_performance(config_file='config.json', task_ids=None):
         'in_progress_jobs': 0,
         'jobs_detail': []
     })
+    assignee_names = {}
     
     for task in tasks:
         task_id = task['id']
-        task_name = task['name']
-        
-        logger.info(f"\n处理任务: {task_name} (ID: {task_id})")
         
-        jobs = client.get_task_jobs(task_id)
+        jobs = task_jobs.get(task_id, [])
         if not jobs:
             continue
         
-        logger.info(f"   → Jobs数: {len(jobs)}")
-        
-        # 并发获取标注数据
-        def check_job(job):
-            job_id = job.get('id')
-            shapes, tracks, annotated_frames = client.get_job_annotations(job_id)
-            return job_id, shapes, tracks, annotated_frames
-        
-        job_annotations = {}
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(check_job, job): job for job in jobs}
-            completed = 0
-            for future in as_completed(futures):
-                job_id, shapes, tracks, annotated_frames = future.result()
-                job_annotations[job_id] = {
-                    'shapes': shapes,
-                    'tracks': tracks,
-                    'annotated_frames': annotated_frames
-                }
-                completed += 1
-                if completed % 10 == 0 or completed == len(jobs):
-                    print(f"\r   检查进度: {completed}/{len(jobs)} jobs", end='', flush=True)
-        print()
-        
         # 统计每个用户
         for job in jobs:
             job_id = job['id']
@@ -262,12 +180,15 @@ def check_daily_performance(config_file='config.json', task_ids=None):
             
             assignee_id = assignee.get('id')
             assignee_name = user_map.get(assignee_id, assignee.get('username', f'User_{assignee_id}'))
+            assignee_names[assignee_id] = assignee_name
             
             start_frame = job.get('start_frame', 0)
             stop_frame = job.get('stop_frame', 0)
             frame_count = stop_frame - start_frame + 1
             
-            ann = job_annotations.get(job_id, {'shapes': 0, 'tracks': 0, 'annotated_frames': 0})
+            ann = job_annotations.get(job_id)
+            if ann is None:
+                continue
             annotated_frames = ann['annotated_frames']
             shapes = ann['shapes']
             
@@ -312,10 +233,27 @@ def check_daily_performance(config_file='config.json', task_ids=None):
                 'updated_date': updated_date
             })
     
-    # 6. 加载昨天的快照计算今日增量
-    yesterday_snapshot = load_snapshot(yesterday)
+    # 4. 从绩效历史库取增量基准：窗口开始之前最近的一次记录（漏跑几天时为这几天的累计）
+    history = open_history()
     
-    # 7. 计算今日数据和增量
+    # 记录本次同步的job标注计数采样；有效速度 = 采样增量的帧数 / 实际工作小时（不含空闲时段）
+    record_state_samples(history, state)
+    active_speeds = {
+        assignee_names[assignee_id]: stats
+        for assignee_id, stats in history.active_speeds(now - (since or ACTIVE_SPEED_WINDOW), now).items()
+        if assignee_id in assignee_names
+    }
+    
+    scope = task_scope(task_ids)
+    window_start = now - since if since else now.replace(hour=0, minute=0, second=0, microsecond=0)
+    baseline_run = history.find_run(window_start, scope)
+    baseline_users = history.user_counters(baseline_run[0]) if baseline_run else {}
+    if baseline_run:
+        logger.info(f"📅 增量基准: {baseline_run[1]}")
+    else:
+        logger.info(f"📅 {window_start:%Y-%m-%d %H:%M} 之前没有记录，本次不计算增量")
+    
+    # 5. 计算今日数据和增量
     today_data = {
         'date': today,
         'generated_at': datetime.now().isoformat(),
@@ -333,12 +271,11 @@ def check_daily_performance(config_file='config.json', task_ids=None):
         today_frames = data['annotated_frames']
         today_shapes = data['total_shapes']
         
-        if yesterday_snapshot and user in yesterday_snapshot.get('users', {}):
-            yesterday_data = yesterday_snapshot['users'][user]
-            delta_frames = today_frames - yesterday_data.get('annotated_frames', 0)
-            delta_shapes = today_shapes - yesterday_data.get('total_shapes', 0)
+        if user in baseline_users:
+            delta_frames = today_frames - baseline_users[user]['annotated_frames']
+            delta_shapes = today_shapes - baseline_users[user]['total_shapes']
         else:
-            delta_frames = None  # 无昨日数据，无法计算增量
+            delta_frames = None  # 无基准数据，无法计算增量
             delta_shapes = None
         
         today_data['users'][user] = {
@@ -354,60 +291,80 @@ def check_daily_performance(config_file='config.json', task_ids=None):
         performance_records.append({
             'date': today,
             'user': user,
-            'today_frames': delta_frames if delta_frames is not None else 'N/A',
+            'today_frames': delta_frames,
             'total_annotated_frames': data['annotated_frames'],
             'total_frames': data['total_frames'],
-            'today_shapes': delta_shapes if delta_shapes is not None else 'N/A',
+            'today_shapes': delta_shapes,
             'total_shapes': data['total_shapes'],
             'completed_jobs': data['completed_jobs'],
             'in_progress_jobs': data['in_progress_jobs'],
             'total_jobs': data['total_jobs'],
-            'avg_speed': f"{avg_speed:.1f}" if avg_speed else 'N/A'
+            'avg_speed': round(avg_speed, 1) if avg_speed else None,
+            'active_hours': active_speeds.get(user, {}).get('active_hours', 0),
+            'active_speed': round(active_speeds[user]['speed'], 1) if active_speeds.get(user, {}).get('speed') else None
         })
     
-    # 8. 保存今日快照
-    save_snapshot(today, today_data)
-    
-    # 9. 输出CSV
+    # 6. 追加到绩效历史库（数据不完整时不记录，避免污染之后的增量）
+    # 记录时间取数据的同步时间：--offline 重复运行时本地库的数据没变，不能以当前时间再记一次
+    synced_at = datetime.fromisoformat(state['synced_at']) if state.get('synced_at') else now
+    if failed_job_ids:
+        logger.warning(f"⚠️  有jobs获取失败，本次不记录历史，也不追加汇总CSV")
+        record = False
+    elif record and history.has_run(synced_at, scope):
+        logger.info(f"ℹ️  {synced_at} 同步的数据已记录过，本次不记录历史，也不追加汇总CSV")
+        record = False
+    elif record:
+        job_records = [
+            {**{key: job[key] for key in ('job_id', 'task_id', 'annotated_frames', 'shapes', 'status', 'speed')},
+             'user': user, 'frame_count': job['frame_count']}
+            for user, data in user_data.items() for job in data['jobs_detail']
+        ]
+        history.record_run(today_data['users'], job_records, synced_at, scope)
+        logger.info(f"✅ 绩效历史已记录: {history.path}")
+    history.close()
+    
+    # 7. 输出CSV
     csv_file = report_dir / f'daily_performance_{today}.csv'
-    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-        fieldnames = ['date', 'user', 'today_frames', 'total_annotated_frames', 'total_frames', 
-                      'today_shapes', 'total_shapes', 'completed_jobs', 'in_progress_jobs', 
-                      'total_jobs', 'avg_speed']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+    with atomic_open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
         writer.writeheader()
         writer.writerows(performance_records)
     
     logger.info(f"✅ CSV报告已保存: {csv_file}")
     
-    # 10. 追加到汇总CSV
+    # 8. 追加到汇总CSV
     summary_file = report_dir / 'performance_summary.csv'
     file_exists = summary_file.exists()
     
-    with open(summary_file, 'a', newline='', encoding='utf-8') as f:
-        fieldnames = ['date', 'user', 'today_frames', 'total_annotated_frames', 'total_frames',
-                      'today_shapes', 'total_shapes', 'completed_jobs', 'in_progress_jobs',
-                      'total_jobs', 'avg_speed']
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerows(performance_records)
-    
-    logger.info(f"✅ 汇总CSV已更新: {summary_file}")
+    if record:
+        # 已有的汇总CSV沿用其表头（旧文件没有新增的列），保持每行列数一致
+        fieldnames = CSV_FIELDS
+        if file_exists:
+            with open(summary_file, 'r', newline='', encoding='utf-8') as f:
+                fieldnames = next(csv.reader(f), None) or CSV_FIELDS
+        with open(summary_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            if not file_exists:
+                writer.writeheader()
+            writer.writerows(performance_records)
+        
+        logger.info(f"✅ 汇总CSV已更新: {summary_file}")
     
-    # 11. 显示结果
+    # 9. 显示结果
     logger.info("\n" + "="*80)
     logger.info("📊 今日绩效报告")
     logger.info("="*80)
     
-    for record in sorted(performance_records, key=lambda x: x['total_annotated_frames'], reverse=True):
-        logger.info(f"\n👤 {record['user']}:")
-        if record['today_frames'] != 'N/A':
-            logger.info(f"   今日标注: {record['today_frames']} 帧")
-        logger.info(f"   累计标注: {record['total_annotated_frames']}/{record['total_frames']} 帧")
-        logger.info(f"   标注数量: {record['total_shapes']}")
-        logger.info(f"   Jobs: {record['completed_jobs']}完成/{record['in_progress_jobs']}进行中/{record['total_jobs']}总计")
-        logger.info(f"   平均速度: {record['avg_speed']} 帧/小时")
+    for row in sorted(performance_records, key=lambda x: x['total_annotated_frames'], reverse=True):
+        logger.info(f"\n👤 {row['user']}:")
+        if row['today_frames'] is not None:
+            logger.info(f"   {'窗口内' if since else '今日'}标注: {row['today_frames']} 帧")
+        logger.info(f"   累计标注: {row['total_annotated_frames']}/{row['total_frames']} 帧")
+        logger.info(f"   标注数量: {row['total_shapes']}")
+        logger.info(f"   Jobs: {row['completed_jobs']}完成/{row['in_progress_jobs']}进行中/{row['total_jobs']}总计")
+        logger.info(f"   平均速度: {row['avg_speed'] if row['avg_speed'] is not None else 'N/A'} 帧/小时")
+        if row['active_speed'] is not None:
+            logger.info(f"   有效速度: {row['active_speed']} 帧/小时（工作 {row['active_hours']} 小时）")
     
     logger.info("\n" + "="*80)
     logger.info(f"📝 日志文件: {log_file}")
@@ -417,16 +374,31 @@ def main():
     """命令行入口"""
     import sys
     
+    args = sys.argv[1:]
+    offline = '--offline' in args
+    args = [arg for arg in args if arg != '--offline']
+    
+    since = None
+    if '--since' in args:
+        index = args.index('--since')
+        try:
+            since = parse_duration(args[index + 1])
+        except (IndexError, ValueError) as e:
+            logger.error(f"❌ --since 参数无效: {e}")
+            logger.info("用法: python check_daily_performance.py [--offline] [--since 7d] [task_id1] ...")
+            return
+        del args[index:index + 2]
+    
     task_ids = None
-    if len(sys.argv) > 1:
+    if args:
         try:
-            task_ids = [int(tid) for tid in sys.argv[1:]]
+            task_ids = [int(tid) for tid in args]
             logger.info(f"检查指定任务: {task_ids}")
         except ValueError:
             logger.error("❌ 任务ID必须是数字")
             return
     
-    check_daily_performance(task_ids=task_ids)
+    check_daily_performance(task_ids=task_ids, offline=offline, since=since)
 
 
 if __name__ == "__main__":
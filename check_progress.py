@@ -8,7 +8,12 @@ import logging
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cvat_client import BaseCVATClient
+from atomic_write import atomic_open
+from column_table import ColumnTable
+from performance_history import ACTIVE_SPEED_WINDOW, PerformanceHistory, record_state_samples
+from state_store import get_excluded_tasks, get_sync_config, load_state, open_state_store, sync_state
 
 # 配置日志
 log_dir = Path('logs')
@@ -19,122 +24,49 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
     handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.FileHandler(log_file, encoding='utf-8', delay=True),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+# 进度报告中每个job一行的列
+JOB_COLUMNS = ('job_id', 'task_id', 'assignee', 'state', 'frames', 'annotated_frames', 'shapes', 'tracks', 'speed')
+
 
-class CVATClient:
+class CVATClient(BaseCVATClient):
     """CVAT客户端"""
     
-    def __init__(self, base_url, api_key):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.headers = {'Authorization': f'Token {api_key}'}
+    def __init__(self, base_url, api_key, http_config=None):
+        super().__init__(base_url, api_key, http_config)
         logger.info(f"初始化CVAT客户端: {base_url}")
     
-    def get_all_tasks(self, organization_slug=None):
-        """获取所有任务"""
-        url = f'{self.base_url}/api/tasks'
-        params = {'page_size': 500}
-        if organization_slug:
-            params['org'] = organization_slug
-        
-        all_tasks = []
-        page = 1
-        
-        try:
-            while True:
-                params['page'] = page
-                response = requests.get(url, headers=self.headers, params=params, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                results = data.get('results', [])
-                all_tasks.extend(results)
-                
-                if not data.get('next'):
-                    break
-                page += 1
-            
-            logger.info(f"✅ 获取任务列表成功: {len(all_tasks)} 个任务")
-            return all_tasks
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 获取任务列表失败: {e}")
-            return []
-    
-    def get_task_jobs(self, task_id):
-        """获取任务的所有jobs"""
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id, 'page_size': 1000}
-        
-        try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            jobs_data = response.json()
-            jobs = jobs_data.get('results', [])
-            return jobs
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 获取jobs失败: task_id={task_id}, {e}")
-            return []
-    
     def get_user_info(self, user_id):
         """获取用户信息"""
         url = f'{self.base_url}/api/users/{user_id}'
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self.get(url, timeout=30)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ 获取用户信息失败: user_id={user_id}, {e}")
             return None
-    
-    def get_organization_members(self, organization_slug):
-        """获取组织成员列表"""
-        url = f'{self.base_url}/api/memberships'
-        params = {'org': organization_slug, 'page_size': 100}
-        
-        try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            members = data.get('results', [])
-            return members
-        except requests.exceptions.RequestException as e:
-            logger.error(f"❌ 获取组织成员失败: {e}")
-            return []
-    
-    def get_job_annotations_count(self, job_id):
-        """获取job的标注数量和已标注帧数"""
-        url = f'{self.base_url}/api/jobs/{job_id}/annotations'
-        
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            shapes = data.get('shapes', [])
-            tracks = data.get('tracks', [])
-            
-            # 统计有标注的帧（去重）
-            annotated_frames = set()
-            for shape in shapes:
-                annotated_frames.add(shape.get('frame'))
-            for track in tracks:
-                # track的shapes里也有frame
-                for shape in track.get('shapes', []):
-                    annotated_frames.add(shape.get('frame'))
-            
-            return len(shapes), len(tracks), len(annotated_frames)
-        except requests.exceptions.Timeout:
-            logger.debug(f"检查job {job_id}超时")
-            return 0, 0, 0
-        except requests.exceptions.RequestException as e:
-            logger.debug(f"检查job {job_id}失败: {e}")
-            return 0, 0, 0
+
+
+def job_speed(job, annotated_frames):
+    """job的标注速度（帧/小时）：从分配到最后修改的时长内完成的帧数，无法计算时为None"""
+    assigned_date = job.get('assignee_updated_date') or job.get('created_date')
+    updated_date = job.get('updated_date')
+    if not (assigned_date and updated_date and annotated_frames > 0):
+        return None
+    try:
+        assigned_dt = datetime.fromisoformat(assigned_date.replace('Z', '+00:00'))
+        updated_dt = datetime.fromisoformat(updated_date.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    hours = (updated_dt - assigned_dt).total_seconds() / 3600
+    return annotated_frames / hours if hours > 0 else None
 
 
 def format_duration(seconds):
@@ -151,8 +83,13 @@ def format_duration(seconds):
         return f"{minutes}分钟"
 
 
-def check_progress(config_file='config.json', task_ids=None, show_details=False):
-    """检查标注进度主流程"""
+def check_progress(config_file='config.json', task_ids=None, show_details=False, offline=False, state=None,
+                   report_file=None):
+    """检查标注进度主流程
+    
+    state: 可选，已同步好的数据（load_state/sync_state 的结果），提供时不再同步
+    report_file: 可选，详细报告的路径（默认按时间命名，watch 模式每轮覆盖同一个文件）
+    """
     logger.info("="*60)
     logger.info("检查标注进度")
     logger.info("="*60)
@@ -170,30 +107,39 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
     api_key = config['cvat']['api_key']
     organization_slug = config.get('organization', {}).get('slug')
     
-    # 2. 初始化客户端
-    client = CVATClient(cvat_url, api_key)
-    
-    # 3. 获取任务列表
-    logger.info(f"\n📋 获取任务列表...")
-    
-    if task_ids:
-        # 使用指定的任务ID
-        tasks = []
-        for task_id in task_ids:
-            url = f'{cvat_url}/api/tasks/{task_id}'
-            try:
-                response = requests.get(url, headers=client.headers, timeout=30)
-                response.raise_for_status()
-                tasks.append(response.json())
-            except Exception as e:
-                logger.error(f"❌ 获取任务失败: task_id={task_id}, {e}")
-    else:
-        # 获取所有任务
-        tasks = client.get_all_tasks(organization_slug)
-    
-    # 排除旧平台任务
-    EXCLUDED_TASKS = {1967925}
-    tasks = [t for t in tasks if t['id'] not in EXCLUDED_TASKS]
+    # 2. 获取任务、jobs、成员和标注统计（在线时先同步到本地状态库，--offline 直接查询本地库）
+    if state is None:
+        store = open_state_store(config)
+        client = None
+        try:
+            if offline:
+                logger.info(f"\n💾 从本地状态库读取（不访问网络）: {store.path}")
+                state = load_state(store, task_ids, get_excluded_tasks(config))
+                if not state['synced_at']:
+                    logger.error("❌ 本地状态库为空，请先运行: python sync.py")
+                    return
+                logger.info(f"   上次同步: {state['synced_at']}")
+            else:
+                client = CVATClient(cvat_url, api_key, config.get('http'))
+                
+                logger.info(f"\n🔍 同步任务、jobs和标注状态（并发）...")
+                
+                def on_progress(completed, total):
+                    if completed % 100 == 0:
+                        logger.info(f"      进度: {completed}/{total} jobs")
+                
+                state = sync_state(client, store, organization_slug, task_ids, get_excluded_tasks(config),
+                                   on_progress, **get_sync_config(config))
+                if state is None:
+                    return
+        finally:
+            store.close()
+            if client is not None:
+                client.close()
+    
+    tasks = state['tasks']
+    task_jobs = state['task_jobs']
+    summaries = state['summaries']
     
     if not tasks:
         logger.warning("⚠️  未找到任何任务")
@@ -201,11 +147,9 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
     
     logger.info(f"✅ 找到 {len(tasks)} 个任务")
     
-    # 4. 获取组织成员信息（用于显示用户名）
-    logger.info(f"\n👥 获取组织成员信息...")
-    members = client.get_organization_members(organization_slug) if organization_slug else []
+    # 组织成员信息（用于显示用户名）
     user_map = {}
-    for member in members:
+    for member in state['members']:
         user = member.get('user')
         if user:
             user_id = user.get('id')
@@ -213,92 +157,56 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
             user_map[user_id] = username
     
     logger.info(f"✅ 找到 {len(user_map)} 个成员")
+    logger.info(f"✅ 已检查 {len(summaries)} 个jobs")
+    
+    # 重试后仍失败的jobs单独计为 unknown，不能当成未开始
+    failed_job_ids = sorted(job_id for job_id, summary in summaries.items() if summary is None)
+    if failed_job_ids:
+        logger.warning(f"⚠️  {len(failed_job_ids)} 个jobs获取标注失败（已重试），统计中标记为 unknown")
     
-    # 5. 统计每个任务的进度
+    # 记录本次同步的job标注计数采样，按采样增量计算有效速度（排除空闲时段）
+    history = PerformanceHistory()
+    record_state_samples(history, state)
+    active_speeds = history.active_speeds(datetime.now() - ACTIVE_SPEED_WINDOW)
+    history.close()
+    
+    # 3. 统计每个任务的进度
     logger.info(f"\n📊 分析任务进度...")
     
-    all_stats = []
-    user_stats = defaultdict(lambda: {
-        'total_jobs': 0,
-        'completed': 0,
-        'in_progress': 0,
-        'not_started': 0,
-        'total_frames': 0,
-        'annotated_frames': 0,
-        'completed_jobs': 0,
-        'total_shapes': 0,
-        'speeds': []  # 存储每个job的速度，用于计算平均
-    })
+    # 每个job一行，所有汇总都从这张列式表分组得到
+    job_table = ColumnTable(JOB_COLUMNS)
+    assignee_names = {}
     
     for task in tasks:
         task_id = task['id']
         task_name = task['name']
-        task_status = task.get('status')
-        created_date = task.get('created_date', '')[:10]
         
         logger.info(f"\n处理任务: {task_name} (ID: {task_id})")
         
-        # 获取任务的jobs
-        jobs = client.get_task_jobs(task_id)
+        jobs = task_jobs.get(task_id, [])
         
         if not jobs:
             logger.info(f"   → 没有jobs")
             continue
         
         logger.info(f"   → Jobs数: {len(jobs)}")
-        logger.info(f"   → 检查标注状态（并发）...")
-        
-        # 并发检查每个job的标注数量
-        def check_job(job):
-            job_id = job.get('id')
-            start_frame = job.get('start_frame', 0)
-            stop_frame = job.get('stop_frame', 0)
-            frame_count = stop_frame - start_frame + 1
-            shapes, tracks, annotated_frames = client.get_job_annotations_count(job_id)
-            return job_id, shapes, tracks, annotated_frames, frame_count
-        
-        job_annotations = {}
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(check_job, job): job for job in jobs}
-            completed = 0
-            for future in as_completed(futures):
-                job_id, shapes, tracks, annotated_frames, frame_count = future.result()
-                job_annotations[job_id] = {
-                    'shapes': shapes, 
-                    'tracks': tracks, 
-                    'annotated_frames': annotated_frames,
-                    'frame_count': frame_count
-                }
-                completed += 1
-                if completed % 10 == 0 or completed == len(jobs):
-                    logger.info(f"      进度: {completed}/{len(jobs)} jobs")
-        
-        # 统计任务级别的信息
-        task_stats = {
-            'task_id': task_id,
-            'task_name': task_name,
-            'task_status': task_status,
-            'created_date': created_date,
-            'total_jobs': len(jobs),
-            'job_stats': defaultdict(int),
-            'assignee_stats': defaultdict(lambda: defaultdict(int)),
-            'total_frames': 0,
-            'completed_frames': 0
-        }
         
         for job in jobs:
-            job_id = job['id']
-            state = job.get('state', 'new')
             assignee = job.get('assignee')
-            start_frame = job.get('start_frame', 0)
-            stop_frame = job.get('stop_frame', 0)
-            frame_count = stop_frame - start_frame + 1
+            assignee_name = None
+            if assignee:
+                assignee_id = assignee.get('id')
+                assignee_name = user_map.get(assignee_id, assignee.get('username') or f"User_{assignee_id}")
+                assignee_names[assignee_id] = assignee_name
+            
+            summary = summaries.get(job['id'])
+            if summary is None:
+                # 获取标注失败：只计数，不计入帧数，避免把未知当成未开始
+                job_table.append(job_id=job['id'], task_id=task_id, assignee=assignee_name, state='unknown')
+                continue
             
-            # 获取标注数量
-            ann_info = job_annotations.get(job_id, {'shapes': 0, 'tracks': 0, 'annotated_frames': 0, 'frame_count': frame_count})
-            shapes_count = ann_info['shapes']
-            tracks_count = ann_info['tracks']
-            annotated_frames = ann_info['annotated_frames']
+            frame_count = job.get('stop_frame', 0) - job.get('start_frame', 0) + 1
+            annotated_frames = summary['annotated_frames']
             
             # 统计job状态（基于已标注帧数判断）
             if annotated_frames == 0:
@@ -308,58 +216,89 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
             else:
                 actual_state = 'in_progress'
             
-            task_stats['job_stats'][actual_state] += 1
-            task_stats['total_frames'] += frame_count
-            
-            # 计入已标注帧数（精确统计）
-            task_stats['completed_frames'] += annotated_frames
-            
-            # 统计每个标注人员的情况
-            if assignee:
-                assignee_id = assignee.get('id')
-                assignee_username = assignee.get('username')
-                assignee_name = user_map.get(assignee_id, assignee_username or f"User_{assignee_id}")
-                
-                task_stats['assignee_stats'][assignee_name]['total'] += 1
-                task_stats['assignee_stats'][assignee_name][actual_state] += 1
-                task_stats['assignee_stats'][assignee_name]['frames'] += frame_count
-                task_stats['assignee_stats'][assignee_name]['annotated_frames'] = \
-                    task_stats['assignee_stats'][assignee_name].get('annotated_frames', 0) + annotated_frames
-                task_stats['assignee_stats'][assignee_name]['shapes'] = \
-                    task_stats['assignee_stats'][assignee_name].get('shapes', 0) + shapes_count
-                
-                # 计算速度（帧/小时）
-                assigned_date = job.get('assignee_updated_date') or job.get('created_date')
-                updated_date = job.get('updated_date')
-                if assigned_date and updated_date and annotated_frames > 0:
-                    try:
-                        from datetime import datetime as dt
-                        assigned_dt = dt.fromisoformat(assigned_date.replace('Z', '+00:00'))
-                        updated_dt = dt.fromisoformat(updated_date.replace('Z', '+00:00'))
-                        hours = (updated_dt - assigned_dt).total_seconds() / 3600
-                        if hours > 0:
-                            speed = annotated_frames / hours
-                            user_stats[assignee_name]['speeds'].append(speed)
-                    except:
-                        pass
-                
-                # 全局统计
-                user_stats[assignee_name]['total_jobs'] += 1
-                user_stats[assignee_name][actual_state] += 1
-                user_stats[assignee_name]['total_frames'] += frame_count
-                user_stats[assignee_name]['annotated_frames'] = \
-                    user_stats[assignee_name].get('annotated_frames', 0) + annotated_frames
-                user_stats[assignee_name]['total_shapes'] = \
-                    user_stats[assignee_name].get('total_shapes', 0) + shapes_count
-                
-                # 完成的job数
-                if actual_state == 'completed':
-                    user_stats[assignee_name]['completed_jobs'] = \
-                        user_stats[assignee_name].get('completed_jobs', 0) + 1
-        
-        all_stats.append(task_stats)
+            job_table.append(
+                job_id=job['id'],
+                task_id=task_id,
+                assignee=assignee_name,
+                state=actual_state,
+                frames=frame_count,
+                annotated_frames=annotated_frames,
+                shapes=summary['shapes'],
+                tracks=summary['tracks'],
+                speed=job_speed(job, annotated_frames),
+            )
+    
+    # 按任务 / 任务×人员 / 人员分组汇总（unknown的job只计数，不计入帧数和标注数）
+    known = job_table.mask('state', lambda state: state != 'unknown')
+    assigned = job_table.mask('assignee', lambda assignee: assignee is not None)
+    assigned_known = [a and k for a, k in zip(assigned, known)]
+    
+    task_states = job_table.pivot('task_id', 'state')
+    task_frames = job_table.group_by('task_id', mask=known,
+                                     total_frames=('frames', 'sum'),
+                                     completed_frames=('annotated_frames', 'sum'))
+    assignee_states = job_table.pivot(('task_id', 'assignee'), 'state', mask=assigned)
+    assignee_frames = job_table.group_by(('task_id', 'assignee'), mask=assigned_known,
+                                         frames=('frames', 'sum'),
+                                         annotated_frames=('annotated_frames', 'sum'),
+                                         shapes=('shapes', 'sum'))
+    user_states = job_table.pivot('assignee', 'state', mask=assigned)
+    user_frames = job_table.group_by('assignee', mask=assigned_known,
+                                     total_frames=('frames', 'sum'),
+                                     annotated_frames=('annotated_frames', 'sum'),
+                                     total_shapes=('shapes', 'sum'),
+                                     speeds=('speed', 'list'))
+    
+    task_assignee_stats = defaultdict(dict)
+    for (task_id, assignee), states in assignee_states.items():
+        task_assignee_stats[task_id][assignee] = {
+            'total': sum(states.values()),
+            **states,
+            **assignee_frames.get((task_id, assignee), {}),
+        }
     
-    # 6. 显示结果
+    all_stats = []
+    for task in tasks:
+        task_id = task['id']
+        if task_id not in task_states:
+            continue
+        frames = task_frames.get(task_id, {})
+        all_stats.append({
+            'task_id': task_id,
+            'task_name': task['name'],
+            'task_status': task.get('status'),
+            'created_date': task.get('created_date', '')[:10],
+            'total_jobs': sum(task_states[task_id].values()),
+            'job_stats': task_states[task_id],
+            'assignee_stats': task_assignee_stats.get(task_id, {}),
+            'total_frames': frames.get('total_frames', 0),
+            'completed_frames': frames.get('completed_frames', 0),
+        })
+    
+    active_by_name = {assignee_names[assignee_id]: stats for assignee_id, stats in active_speeds.items()
+                      if assignee_id in assignee_names}
+    
+    user_stats = {}
+    for assignee, states in user_states.items():
+        frames = user_frames.get(assignee, {})
+        active = active_by_name.get(assignee, {})
+        user_stats[assignee] = {
+            'total_jobs': sum(states.values()),
+            'completed': states.get('completed', 0),
+            'in_progress': states.get('in_progress', 0),
+            'not_started': states.get('not_started', 0),
+            'unknown': states.get('unknown', 0),
+            'total_frames': frames.get('total_frames', 0),
+            'annotated_frames': frames.get('annotated_frames', 0),
+            'completed_jobs': states.get('completed', 0),
+            'total_shapes': frames.get('total_shapes', 0),
+            'speeds': frames.get('speeds', []),  # 每个job的速度，用于计算平均
+            # 有效速度：最近7天采样增量的帧数 / 实际工作小时（不含空闲时段）
+            'active_hours': active.get('active_hours', 0),
+            'active_speed': active.get('speed'),
+        }
+    
+    # 4. 显示结果
     logger.info("\n" + "="*80)
     logger.info("📊 任务进度汇总")
     logger.info("="*80)
@@ -386,6 +325,7 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
                 completed = stats.get('completed', 0)
                 in_progress = stats.get('in_progress', 0)
                 not_started = stats.get('not_started', 0)
+                unknown = stats.get('unknown', 0)
                 frames = stats.get('frames', 0)
                 annotated_frames = stats.get('annotated_frames', 0)
                 shapes = stats.get('shapes', 0)
@@ -393,10 +333,11 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
                 frame_rate = annotated_frames * 100 // frames if frames > 0 else 0
                 
                 logger.info(f"     👤 {assignee}:")
-                logger.info(f"        Jobs: {completed}完成/{in_progress}进行中/{not_started}未开始 (共{total})")
+                unknown_text = f"/{unknown}获取失败" if unknown else ""
+                logger.info(f"        Jobs: {completed}完成/{in_progress}进行中/{not_started}未开始{unknown_text} (共{total})")
                 logger.info(f"        帧数: {annotated_frames}/{frames} ({frame_rate}%) | 标注数: {shapes}")
     
-    # 7. 全局标注人员统计
+    # 5. 全局标注人员统计
     logger.info("\n" + "="*80)
     logger.info("👥 标注人员总体进度")
     logger.info("="*80)
@@ -414,6 +355,7 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
             completed_jobs = stats.get('completed_jobs', 0)
             in_progress = stats.get('in_progress', 0)
             not_started = stats.get('not_started', 0)
+            unknown = stats.get('unknown', 0)
             total_frames = stats['total_frames']
             annotated_frames = stats.get('annotated_frames', 0)
             total_shapes = stats.get('total_shapes', 0)
@@ -423,10 +365,13 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
             frame_completion_rate = annotated_frames * 100 // total_frames if total_frames > 0 else 0
             
             logger.info(f"\n👤 {assignee}:")
-            logger.info(f"   Jobs: {completed_jobs}完成/{in_progress}进行中/{not_started}未开始 (共{total})")
+            unknown_text = f"/{unknown}获取失败" if unknown else ""
+            logger.info(f"   Jobs: {completed_jobs}完成/{in_progress}进行中/{not_started}未开始{unknown_text} (共{total})")
             logger.info(f"   帧数: {annotated_frames}/{total_frames} ({frame_completion_rate}%)")
             logger.info(f"   标注数: {total_shapes}")
             logger.info(f"   平均速度: {avg_speed:.1f} 帧/小时" if avg_speed else "   平均速度: N/A")
+            if stats['active_speed']:
+                logger.info(f"   有效速度: {stats['active_speed']:.1f} 帧/小时（近7天工作 {stats['active_hours']} 小时）")
             
             # 进度条（基于帧完成率）
             bar_length = 40
@@ -437,35 +382,42 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
         sorted_users = []
         logger.info("   未找到已分配的任务")
     
-    # 8. 保存详细报告
-    report_file = log_dir / f'progress_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    # 6. 保存详细报告
+    if report_file is None:
+        report_file = log_dir / f'progress_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
     
     report = {
         'generated_at': datetime.now().isoformat(),
         'summary': {
             'total_tasks': len(all_stats),
-            'total_users': len(user_stats)
+            'total_users': len(user_stats),
+            'failed_jobs': failed_job_ids
         },
         'tasks': all_stats,
-        'users': dict(user_stats)
+        'users': user_stats,
+        # 每个job一行的原始表（列式：{列名: [值, ...]}），便于其他工具做新的汇总
+        'jobs': job_table.columns
     }
     
-    with open(report_file, 'w', encoding='utf-8') as f:
+    with atomic_open(report_file, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=2, ensure_ascii=False, default=str)
     
     logger.info(f"\n✅ 详细报告已保存: {report_file}")
     logger.info(f"📝 日志文件: {log_file}")
     
-    # 9. 生成简单的每日报告
+    # 10. 生成简单的每日报告
     daily_report_file = log_dir / f'daily_report_{datetime.now().strftime("%Y%m%d")}.txt'
     
-    with open(daily_report_file, 'w', encoding='utf-8') as f:
+    with atomic_open(daily_report_file, 'w', encoding='utf-8') as f:
         f.write(f"标注进度日报 - {datetime.now().strftime('%Y年%m月%d日')}\n")
         f.write("="*60 + "\n\n")
         
         f.write("📊 总体情况\n")
         f.write(f"  任务数: {len(all_stats)}\n")
-        f.write(f"  标注人员: {len(user_stats)}\n\n")
+        f.write(f"  标注人员: {len(user_stats)}\n")
+        if failed_job_ids:
+            f.write(f"  ⚠️ 获取标注失败的jobs: {len(failed_job_ids)}（未计入进度）\n")
+        f.write("\n")
         
         f.write("👥 标注人员进度\n")
         f.write("-"*60 + "\n")
@@ -491,6 +443,10 @@ def check_progress(config_file='config.json', task_ids=None, show_details=False)
     
     logger.info(f"📄 每日报告已保存: {daily_report_file}")
     
+    if failed_job_ids:
+        logger.warning(f"\n⚠️  {len(failed_job_ids)} 个jobs获取标注失败，进度可能偏低，请稍后重新运行")
+        logger.warning(f"   失败的jobs: {failed_job_ids[:50]}{' ...' if len(failed_job_ids) > 50 else ''}")
+    
     logger.info("\n" + "="*80)
 
 
@@ -498,18 +454,22 @@ def main():
     """命令行入口"""
     import sys
     
+    args = sys.argv[1:]
+    offline = '--offline' in args
+    args = [arg for arg in args if arg != '--offline']
+    
     task_ids = None
-    if len(sys.argv) > 1:
+    if args:
         # 支持指定任务ID
         try:
-            task_ids = [int(tid) for tid in sys.argv[1:]]
+            task_ids = [int(tid) for tid in args]
             logger.info(f"检查指定任务: {task_ids}")
         except ValueError:
             logger.error("❌ 任务ID必须是数字")
-            logger.info("用法: python check_progress.py [task_id1] [task_id2] ...")
+            logger.info("用法: python check_progress.py [--offline] [task_id1] [task_id2] ...")
             return
     
-    check_progress(task_ids=task_ids)
+    check_progress(task_ids=task_ids, offline=offline)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+云存储（S3 / Cloudflare R2）文件列举 - 核对状态和同步本地状态库共用
+
+文件按 <hash4>/session_<ts>/<chunk>/... 分散存放，单个分页器每次1000个key、顺序翻页很慢。
+这里先用 Delimiter='/' 列出第一层前缀作为分片，多个线程（每个线程一个S3客户端）并发列举各分片，
+按key顺序边列边输出，结果与单个分页器完全一致。
+
+list_cloud_inventory 在本地状态库中维护按session的清单：有json标记的session上传完成后不再变化，
+之后每个分片只列出一层session目录（一个 Delimiter LIST），只重新列举新出现的分片/session和未完整的session。
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError, NoCredentialsError
+    HAS_BOTO3 = True
+except ImportError:
+    HAS_BOTO3 = False
+
+logger = logging.getLogger(__name__)
+
+# 并发列举分片的线程数（每个线程一个S3客户端）
+DEFAULT_LIST_WORKERS = 32
+
+# 第一层分片数少于线程数时继续往下一层拆分，最多拆到这一层
+MAX_SHARD_DEPTH = 3
+
+# 增量列举只检查分片下一层的session目录，更深层或不在session中的文件变化要等完整列举，
+# 距上次完整列举超过此时长时做一次完整列举
+DEFAULT_FULL_LISTING_HOURS = 24 * 7
+
+
+def _client_factory(aws_access_key_id=None, aws_secret_access_key=None, region_name='us-east-1', account_id=None):
+    """返回创建S3客户端的函数；每次调用用独立的Session，可以在多个线程中同时创建"""
+    kwargs = {'config': Config(retries={'max_attempts': 5, 'mode': 'adaptive'})}
+    if account_id:
+        # Cloudflare R2 endpoint
+        kwargs.update(endpoint_url=f'https://{account_id}.r2.cloudflarestorage.com', region_name='auto',
+                      aws_access_key_id=aws_access_key_id, aws_secret_access_key=aws_secret_access_key)
+    elif aws_access_key_id and aws_secret_access_key:
+        # 标准AWS S3
+        kwargs.update(region_name=region_name, aws_access_key_id=aws_access_key_id,
+                      aws_secret_access_key=aws_secret_access_key)
+    else:
+        # 使用默认凭证
+        kwargs.update(region_name=region_name)
+
+    def create():
+        return boto3.session.Session().client('s3', **kwargs)
+    return create
+
+
+def _list_level(s3_client, bucket_name, prefix):
+    """列出 prefix 下一层：(直接位于该层的文件对象, 子前缀)"""
+    objects, prefixes = [], []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter='/'):
+        objects.extend(page.get('Contents', []))
+        prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+    return objects, prefixes
+
+
+def _list_shard_sessions(create_client, bucket_name, shards, known_sessions, workers):
+    """并发列出已知分片下一层的session目录（每个分片一个 Delimiter LIST）
+
+    Returns:
+        (新出现的session前缀, 已消失的session前缀)
+    """
+    local = threading.local()
+
+    def list_shard(shard):
+        if not hasattr(local, 'client'):
+            local.client = create_client()
+        _, prefixes = _list_level(local.client, bucket_name, shard)
+        return shard, {p for p in prefixes if p[len(shard):].startswith('session_')}
+
+    new_sessions, gone_sessions = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for shard, sessions in executor.map(list_shard, shards):
+            known = known_sessions.get(shard, set())
+            new_sessions.extend(sorted(sessions - known))
+            gone_sessions.extend(sorted(known - sessions))
+    return new_sessions, gone_sessions
+
+
+def _discover_shards(s3_client, bucket_name, prefix, workers):
+    """把 prefix 拆成按key顺序排列的单元 [(key或前缀, 文件对象或None), ...]，对象为None的是分片
+
+    一个分片的所有key以该前缀开头、在key顺序中连续，所以按字符串排序单元即为按key排序。
+    """
+    units = [(prefix, None)]
+    for _ in range(MAX_SHARD_DEPTH):
+        shards = [name for name, obj in units if obj is None]
+        if len(shards) >= workers or not shards:
+            break
+        expanded = [unit for unit in units if unit[1] is not None]
+        for shard in shards:
+            objects, prefixes = _list_level(s3_client, bucket_name, shard)
+            expanded.extend((obj['Key'], obj) for obj in objects)
+            expanded.extend((p, None) for p in prefixes)
+        units = sorted(expanded, key=lambda unit: unit[0])
+    return units
+
+
+def iter_s3_objects(create_client, bucket_name, prefix='', workers=DEFAULT_LIST_WORKERS, shards=None):
+    """按分片并发列举对象，按key顺序流式产出 list_objects_v2 返回的对象字典
+
+    最多同时有 workers*2 个分片在列举或等待输出，内存占用与分片大小而不是总文件数成正比。
+
+    Args:
+        create_client: 创建S3客户端的函数，每个线程调用一次
+        bucket_name: 存储桶名称
+        prefix: 路径前缀，自动拆分为分片
+        workers: 并发线程数
+        shards: 可选，直接列举这些前缀（不再拆分，忽略prefix）
+    """
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = create_client()
+        return local.client
+
+    def list_shard(shard):
+        objects = []
+        paginator = client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=shard):
+            objects.extend(page.get('Contents', []))
+        return objects
+
+    if shards is None:
+        units = iter(_discover_shards(client(), bucket_name, prefix, workers))
+    else:
+        units = iter([(shard, None) for shard in sorted(shards)])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def submit_next():
+            for name, obj in units:
+                # 直接位于拆分层的文件不需要请求，按顺序排在队列中
+                if obj is not None:
+                    pending.append([obj])
+                else:
+                    pending.append(executor.submit(list_shard, name))
+                    return
+
+        try:
+            for _ in range(workers * 2):
+                submit_next()
+            while pending:
+                item = pending.popleft()
+                if isinstance(item, list):
+                    yield from item
+                else:
+                    objects = item.result()
+                    submit_next()
+                    yield from objects
+        finally:
+            for item in pending:
+                if not isinstance(item, list):
+                    item.cancel()
+
+
+def iter_s3_keys(create_client, bucket_name, prefix, workers=DEFAULT_LIST_WORKERS):
+    """同 iter_s3_objects，只产出key"""
+    for obj in iter_s3_objects(create_client, bucket_name, prefix, workers):
+        yield obj['Key']
+
+
+def list_s3_files(bucket_name, prefix, aws_access_key_id=None, aws_secret_access_key=None, region_name='us-east-1', account_id=None,
+                  workers=DEFAULT_LIST_WORKERS):
+    """列举S3/R2存储桶中的文件（按第一层前缀分片并发列举）
+    
+    Args:
+        bucket_name: S3 bucket名称
+        prefix: 文件路径前缀
+        aws_access_key_id: AWS Access Key ID
+        aws_secret_access_key: AWS Secret Access Key
+        region_name: AWS Region
+        account_id: Cloudflare R2 Account ID（如果使用R2）
+        workers: 并发列举的线程数
+        
+    Returns:
+        文件路径列表，如果失败返回None
+    """
+    if not HAS_BOTO3:
+        logger.error("❌ boto3未安装，无法访问S3")
+        logger.info("💡 安装: pip install boto3")
+        return None
+    
+    try:
+        create_client = _client_factory(aws_access_key_id, aws_secret_access_key, region_name, account_id)
+        s3_client = create_client()
+        if account_id:
+            logger.info(f"   使用Cloudflare R2: {s3_client.meta.endpoint_url}")
+        
+        logger.info(f"   正在列举文件: {bucket_name}/{prefix}")
+        
+        # 先列举根目录看看有什么
+        logger.info(f"   先检查根目录...")
+        try:
+            root_response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix='', MaxKeys=10)
+            if 'Contents' in root_response:
+                logger.info(f"   根目录示例文件:")
+                for obj in root_response['Contents'][:5]:
+                    logger.info(f"     - {obj['Key']}")
+        except Exception as e:
+            logger.warning(f"   无法列举根目录: {e}")
+        
+        # 按分片并发列举对象
+        files = []
+        for key in iter_s3_keys(create_client, bucket_name, prefix, workers):
+            # 只要文件，不要目录
+            if not key.endswith('/'):
+                files.append(key)
+                # 动态显示扫描进度（终端原地刷新，每1000个刷新一次）
+                if len(files) % 1000 == 0:
+                    print(f"\r   正在扫描... {len(files)} 个文件", end='', flush=True)
+        
+        # 换行，结束动态显示
+        print()
+        logger.info(f"✅ 找到 {len(files)} 个文件")
+        return files
+        
+    except NoCredentialsError:
+        logger.error("❌ AWS凭证未找到")
+        logger.info("💡 在config.json中配置s3部分")
+        return None
+    except ClientError as e:
+        logger.error(f"❌ S3访问失败: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ 列举文件失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def _session_of(key, prefix):
+    """key → (分片前缀, session前缀)；直接位于prefix下的文件返回 (None, None)
+
+    不在 session_* 目录中的文件归入以分片前缀为名的组。
+    """
+    parts = key[len(prefix):].split('/')
+    if len(parts) == 1:
+        return None, None
+    shard = prefix + parts[0] + '/'
+    for i, part in enumerate(parts[:-1]):
+        if part.startswith('session_'):
+            return shard, prefix + '/'.join(parts[:i + 1]) + '/'
+    return shard, shard
+
+
+def _iter_sessions(objects, prefix):
+    """按key顺序流式分组：同一session的key在key顺序中连续，前缀变化时该session即可输出
+
+    分片中不属于任何session的文件散落在各session之间，归入分片组，分片结束时输出。
+    直接位于prefix下的文件不属于任何分片，不进入清单。
+
+    Yields:
+        (session前缀, {'shard', 'complete', 'objects': [(key, etag, last_modified), ...]})
+    """
+    current_prefix, current = None, None
+    loose_shard, loose = None, None
+    for obj in objects:
+        key = obj['Key']
+        shard, session = _session_of(key, prefix)
+        if session is None:
+            continue
+        if session != current_prefix and current is not None:
+            yield current_prefix, current
+            current_prefix, current = None, None
+        if shard != loose_shard and loose is not None:
+            yield loose_shard, loose
+            loose_shard, loose = None, None
+
+        if session == shard:
+            if loose is None:
+                loose_shard, loose = shard, {'shard': shard, 'complete': True, 'objects': []}
+            group = loose
+        else:
+            if current is None:
+                current_prefix, current = session, {'shard': shard, 'complete': False, 'objects': []}
+            group = current
+
+        last_modified = obj.get('LastModified')
+        group['objects'].append((
+            key,
+            (obj.get('ETag') or '').strip('"') or None,
+            last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified,
+        ))
+        if key.endswith('.json'):
+            group['complete'] = True
+
+    if current is not None:
+        yield current_prefix, current
+    if loose is not None:
+        yield loose_shard, loose
+
+
+def list_cloud_inventory(store, bucket_name, prefix, aws_access_key_id=None, aws_secret_access_key=None,
+                         region_name='us-east-1', account_id=None, workers=DEFAULT_LIST_WORKERS,
+                         full=False, full_every_hours=DEFAULT_FULL_LISTING_HOURS):
+    """增量更新云存储清单，返回按key顺序流式读取清单的迭代器
+
+    完整的session（已有json）不再变化，直接用本地清单。每次列出第一层分片和每个已知分片下一层的session目录
+    （每个分片一个 Delimiter LIST，并发），再重新列举新出现的分片、新出现的session和上次未完整的session；
+    消失的分片和session从清单中删除。分片中更深层或不在session中的文件只有完整列举才会更新，
+    距上次完整列举超过 full_every_hours 时（或 full=True）重新列举整个前缀。
+    列举结果按session边列边写入本地库，内存占用与单个session的大小成正比。
+
+    Args:
+        store: StateStore，清单保存在 cloud_sessions / cloud_objects 表
+        其余参数同 list_s3_files
+
+    Returns:
+        文件key的迭代器（按key排序，只包含分片中的文件），如果失败返回None
+    """
+    if not HAS_BOTO3:
+        logger.error("❌ boto3未安装，无法访问S3")
+        logger.info("💡 安装: pip install boto3")
+        return None
+
+    if prefix and not prefix.endswith('/'):
+        # 分片按目录划分，前缀不是目录时无法增量
+        files = list_s3_files(bucket_name, prefix, aws_access_key_id, aws_secret_access_key,
+                              region_name, account_id, workers)
+        return iter(files) if files is not None else None
+
+    meta_key = f'cloud_full_listed_at:{bucket_name}:{prefix}'
+    now = datetime.now()
+    last_full = store.get_meta(meta_key)
+    known = store.query_cloud_sessions(bucket_name, prefix)
+    if not full and not known:
+        full = True
+    if not full and last_full:
+        full = now - datetime.fromisoformat(last_full) > timedelta(hours=full_every_hours)
+
+    try:
+        create_client = _client_factory(aws_access_key_id, aws_secret_access_key, region_name, account_id)
+
+        if full:
+            logger.info(f"   完整列举: {bucket_name}/{prefix}")
+            relist = [prefix]
+            objects = iter_s3_objects(create_client, bucket_name, prefix, workers)
+        else:
+            _, shards = _list_level(create_client(), bucket_name, prefix)
+            known_shards = {shard for shard, _ in known.values()}
+            new_shards = set(shards) - known_shards
+            gone_shards = known_shards - set(shards)
+            known_sessions = {}
+            for session, (shard, _) in known.items():
+                if session != shard:
+                    known_sessions.setdefault(shard, set()).add(session)
+            new_sessions, gone_sessions = _list_shard_sessions(
+                create_client, bucket_name, sorted(known_shards - gone_shards), known_sessions, workers)
+            incomplete = [session for session, (shard, complete) in known.items()
+                          if not complete and shard not in gone_shards and session not in gone_sessions]
+            logger.info(f"   增量列举: {len(shards)} 个分片（新增 {len(new_shards)}，消失 {len(gone_shards)}），"
+                        f"新增 {len(new_sessions)} 个session（消失 {len(gone_sessions)}），"
+                        f"重新列举 {len(incomplete)} 个未完整的session")
+            relist = sorted(new_shards | gone_shards) + gone_sessions + new_sessions + incomplete
+            objects = iter_s3_objects(create_client, bucket_name, workers=workers,
+                                      shards=sorted(new_shards) + new_sessions + incomplete)
+
+        listed = store.replace_cloud_prefixes(bucket_name, relist, _iter_sessions(objects, prefix),
+                                              now.isoformat(timespec='seconds'))
+        if full:
+            store.set_meta(meta_key, now.isoformat(timespec='seconds'))
+        logger.info(f"✅ 云存储清单已更新（本次列举 {listed} 个文件）")
+        return (key for key in store.iter_cloud_files(bucket_name, prefix) if not key.endswith('/'))
+
+    except NoCredentialsError:
+        logger.error("❌ AWS凭证未找到")
+        logger.info("💡 在config.json中配置s3部分")
+        return None
+    except ClientError as e:
+        logger.error(f"❌ S3访问失败: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"❌ 列举文件失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+
+def stored_cloud_inventory(store, bucket_name, prefix):
+    """不访问网络，按key顺序读取本地状态库中上次列举的清单（--offline 用）
+
+    Returns:
+        文件key的迭代器，本地库中没有该前缀的清单时返回None
+    """
+    if not store.query_cloud_sessions(bucket_name, prefix):
+        return None
+    return (key for key in store.iter_cloud_files(bucket_name, prefix) if not key.endswith('/'))
+
+# 计入云存储新数据的图片后缀
+IMAGE_SUFFIXES = ('.jpg', '.png')
+
+
+def session_id_of(key):
+    """key中的session目录 → (session前缀, session_id)，不在session中时返回 (None, None)
+
+    路径格式: b1e0/session_20260108_034622_359267/0000/down/labels/xxx/frame_00089.jpg
+    """
+    parts = key.split('/')
+    for i, part in enumerate(parts[:-1]):
+        if part.startswith('session_'):
+            return '/'.join(parts[:i + 1]), part
+    return None, None
+
+
+class SessionAccumulator:
+    """把按key顺序到达的文件流按session累积，只输出完整session（有json文件）的图片
+
+    同一session的key连续出现：看到json后该session已缓存的图片立即输出，之后的图片直接输出；
+    key离开该session前缀时session结束，仍没有json的丢弃图片、只记录数量。
+    峰值内存与当前未结束session的图片数成正比，与存储桶大小无关。
+    """
+
+    def __init__(self):
+        self.total_files = 0
+        self.complete_sessions = 0
+        self.incomplete_sessions = {}  # {session_id: 图片数}
+        self.peak_buffered = 0
+
+    def complete_images(self, keys):
+        """消费key流，产出完整session的图片key"""
+        current_prefix, current_id = None, None
+        buffered, complete = [], False
+        for key in keys:
+            self.total_files += 1
+            session_prefix, session_id = session_id_of(key)
+            if session_prefix is None:
+                continue
+
+            if session_prefix != current_prefix:
+                self._finish(current_id, complete, buffered)
+                current_prefix, current_id = session_prefix, session_id
+                buffered, complete = [], False
+
+            if key.endswith('.json'):
+                if not complete:
+                    complete = True
+                    yield from buffered
+                    buffered = []
+            elif key.endswith(IMAGE_SUFFIXES):
+                if complete:
+                    yield key
+                else:
+                    buffered.append(key)
+                    self.peak_buffered = max(self.peak_buffered, len(buffered))
+
+        self._finish(current_id, complete, buffered)
+
+    def _finish(self, session_id, complete, buffered):
+        if session_id is None:
+            return
+        if complete:
+            self.complete_sessions += 1
+        else:
+            self.incomplete_sessions[session_id] = self.incomplete_sessions.get(session_id, 0) + len(buffered)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+列式表 - 每列一个list，按列做分组汇总（纯Python，无额外依赖）
+报告先把每个job的结果追加为一行，按任务/人员/状态的各种汇总都由 group_by / pivot 得到，
+新增统计维度只需多写一次分组，不必再改嵌套循环。
+"""
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+# 聚合函数：作用于分组内该列的非None值
+AGGREGATIONS = {
+    'count': len,
+    'sum': sum,
+    'mean': _mean,
+    'list': list,
+}
+
+
+class ColumnTable:
+    """列式表：columns 为 {列名: [值, ...]}，所有列等长"""
+
+    def __init__(self, column_names):
+        self.columns = {name: [] for name in column_names}
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def append(self, **row):
+        """追加一行，未提供的列为None"""
+        for name, values in self.columns.items():
+            values.append(row.get(name))
+
+    def mask(self, column, predicate):
+        """按列生成行掩码 [bool, ...]"""
+        return [predicate(value) for value in self.columns[column]]
+
+    def group_indices(self, keys, mask=None):
+        """{分组键: [行号, ...]}，分组按首次出现的顺序；keys为元组时分组键也是元组"""
+        if isinstance(keys, tuple):
+            rows = zip(*(self.columns[key] for key in keys))
+        else:
+            rows = self.columns[keys]
+
+        groups = {}
+        for i, key in enumerate(rows):
+            if mask is None or mask[i]:
+                groups.setdefault(key, []).append(i)
+        return groups
+
+    def group_by(self, keys, mask=None, **aggregations):
+        """分组汇总
+
+        Args:
+            keys: 分组列名，或列名元组
+            mask: 可选的行掩码，只汇总为True的行
+            aggregations: 输出名=(列名, 聚合函数名)，聚合函数见 AGGREGATIONS，忽略None值
+
+        Returns:
+            {分组键: {输出名: 值}}
+        """
+        result = {}
+        for key, indices in self.group_indices(keys, mask).items():
+            row = {}
+            for name, (column, func) in aggregations.items():
+                values = self.columns[column]
+                row[name] = AGGREGATIONS[func]([values[i] for i in indices if values[i] is not None])
+            result[key] = row
+        return result
+
+    def pivot(self, keys, column, mask=None):
+        """分组计数：{分组键: {列值: 行数}}，只包含出现过的列值"""
+        values = self.columns[column]
+        result = {}
+        for key, indices in self.group_indices(keys, mask).items():
+            counts = result[key] = {}
+            for i in indices:
+                counts[values[i]] = counts.get(values[i], 0) + 1
+        return result
@@ -13,6 +13,9 @@ import re
 import zipfile
 import io
 
+from cvat_client import BaseCVATClient
+from state_store import save_imported_frames
+
 # 配置日志
 log_dir = Path('logs')
 log_dir.mkdir(exist_ok=True)
@@ -29,15 +32,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class CVATClient:
+class CVATClient(BaseCVATClient):
     """CVAT REST API客户端"""
     
-    def __init__(self, base_url, api_key):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.headers = {
-            'Authorization': f'Token {api_key}'
-        }
+    def __init__(self, base_url, api_key, http_config=None):
+        super().__init__(base_url, api_key, http_config)
         logger.info(f"初始化CVAT客户端: {base_url}")
     
     def create_task(self, name, labels, organization_slug=None):
@@ -55,7 +54,7 @@ class CVATClient:
         headers = {**self.headers, 'Content-Type': 'application/json'}
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = self.post(url, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             task = response.json()
             logger.info(f"✅ 任务创建成功: ID={task['id']}, Name={name}, Org={task.get('organization')}")
@@ -90,7 +89,7 @@ class CVATClient:
         headers = {**self.headers, 'Content-Type': 'application/json'}
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=120)
+            response = self.post(url, headers=headers, json=payload, timeout=120)
             response.raise_for_status()
             result = response.json()
             logger.info(f"✅ 数据加载请求已提交: task_id={task_id}")
@@ -120,12 +119,13 @@ class CVATClient:
         files = {'annotation_file': ('annotations.zip', zip_buffer, 'application/zip')}
         
         try:
-            response = requests.post(
+            response = self.post(
                 url, 
                 headers=headers, 
                 params=params, 
                 files=files,
-                timeout=120
+                timeout=120,
+                retry=False  # zip流已被读取，不能直接重发
             )
             response.raise_for_status()
             logger.info(f"✅ 标注上传成功: task_id={task_id}")
@@ -141,7 +141,7 @@ class CVATClient:
         url = f'{self.base_url}/api/tasks/{task_id}'
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self.get(url, timeout=30)
             response.raise_for_status()
             task = response.json()
             return task.get('status')
@@ -181,7 +181,7 @@ class CVATClient:
         while time.time() - start_time < timeout:
             try:
                 url = f'{self.base_url}/api/tasks/{task_id}'
-                response = requests.get(url, headers=self.headers, timeout=30)
+                response = self.get(url, timeout=30)
                 response.raise_for_status()
                 task = response.json()
                 
@@ -232,15 +232,10 @@ class CVATClient:
         return False
     
     def check_task_jobs(self, task_id):
-        """检查任务的jobs状态"""
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id}
-        
+        """检查任务的jobs状态（自动翻页，返回 {'count', 'results'}）"""
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            jobs = response.json()
-            return jobs
+            jobs = list(self.iter_task_jobs(task_id))
+            return {'count': len(jobs), 'results': jobs}
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ 检查jobs失败: {e}")
             return None
@@ -248,15 +243,8 @@ class CVATClient:
     def update_job_names(self, task_id, job_names):
         """更新job名称"""
         # 获取所有jobs
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id}
-        
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            jobs = response.json()
-            
-            job_list = jobs.get('results', [])
+            job_list = list(self.iter_task_jobs(task_id))
             logger.info(f"📝 更新job名称: 共{len(job_list)}个jobs")
             
             # 按start_frame排序（确保顺序正确）
@@ -291,7 +279,7 @@ class CVATClient:
         params = {'target': f'task/{task_id}', 'page_size': 100}
         
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
+            response = self.get(url, params=params, timeout=30)
             if response.status_code == 200:
                 requests_data = response.json()
                 results = requests_data.get('results', [])
@@ -551,7 +539,7 @@ def auto_import_to_cvat(config_file='config.json'):
     logger.info(f"   - 总引用次数: {sum(len(files) for files in job_file_mapping)}")
     
     # 5. 创建CVAT客户端
-    client = CVATClient(cvat_url, api_key)
+    client = CVATClient(cvat_url, api_key, config.get('http'))
     
     # 6. 创建任务
     logger.info(f"\n🏗️  创建任务: {task_name}")
@@ -615,6 +603,11 @@ def auto_import_to_cvat(config_file='config.json'):
         client.check_import_status(task_id)
         return
     
+    # 按 job_file_mapping 加载时帧顺序就是各job文件依次排列，保存帧索引供核对状态使用
+    # （自然排序由CVAT完成，顺序无法确定，核对时从 data/meta 获取）
+    if use_job_mapping:
+        save_imported_frames(config, task_id, [path for session_files in job_file_mapping for path in session_files])
+    
     # 8.5 检查jobs创建情况并更新名称
     logger.info(f"\n🔍 检查jobs创建情况...")
     jobs_data = client.check_task_jobs(task_id)
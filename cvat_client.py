@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+CVAT客户端公共部分 - 所有脚本共享的连接池
+"""
+import json
+import logging
+import math
+import time
+from collections import deque
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from request_scheduler import RequestScheduler, parse_retry_after
+from request_telemetry import telemetry
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ijson
+    # 纯Python后端比一次性解析还慢，只用C后端
+    ijson_backend = ijson.get_backend('yajl2_c')
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+logger = logging.getLogger(__name__)
+
+# 默认并发数（与原来各脚本中 ThreadPoolExecutor(max_workers=10) 保持一致）
+DEFAULT_MAX_WORKERS = 10
+
+# 异步引擎默认的同时在途请求数
+DEFAULT_ASYNC_CONCURRENCY = 100
+
+# 标注响应超过此大小（Content-Length）时用ijson流式统计，不构建完整对象树，限制每个worker的峰值内存；
+# 小响应一次性解析更快（orjson约为json的2倍）
+STREAM_PARSE_MIN_BYTES = 4 * 1024 * 1024
+
+
+def get_http_config(config):
+    """读取config.json中的http配置，补全默认值
+
+    配置示例:
+        "http": {
+            "max_workers": 10,          # 扫描jobs时的并发数（线程引擎）
+            "pool_size": 10,            # 连接池大小，不填则与并发数相同
+            "engine": "threads",        # 扫描引擎: threads / async（async需要aiohttp）
+            "async_concurrency": 100,   # 异步引擎的全局并发上限
+            "max_retries": 5,           # 429/5xx/连接错误的最大重试次数
+            "backoff_base": 1.0,        # 退避基数（秒）
+            "backoff_max": 60.0         # 单次退避上限（秒）
+        }
+    """
+    http_config = (config or {}).get('http', {}) or {}
+
+    max_workers = int(http_config.get('max_workers') or DEFAULT_MAX_WORKERS)
+    max_workers = max(1, max_workers)
+
+    # 连接池至少要能容纳所有并发请求，否则多出来的连接用完即丢，又回到每次握手
+    pool_size = int(http_config.get('pool_size') or max_workers)
+    pool_size = max(pool_size, max_workers)
+
+    engine = http_config.get('engine') or 'threads'
+    if engine not in ('threads', 'async'):
+        logger.warning(f"⚠️  未知的扫描引擎: {engine}，使用 threads")
+        engine = 'threads'
+
+    async_concurrency = int(http_config.get('async_concurrency') or DEFAULT_ASYNC_CONCURRENCY)
+    async_concurrency = max(1, async_concurrency)
+
+    return {
+        'max_workers': max_workers,
+        'pool_size': pool_size,
+        'engine': engine,
+        'async_concurrency': async_concurrency,
+        'max_retries': int(http_config.get('max_retries', 5)),
+        'backoff_base': float(http_config.get('backoff_base', 1.0)),
+        'backoff_max': float(http_config.get('backoff_max', 60.0)),
+    }
+
+
+def updated_since_filter(since):
+    """列表接口的过滤条件（JSON Logic）：只返回 updated_date 晚于 since 的对象"""
+    return json.dumps({'and': [{'>': [{'var': 'updated_date'}, since]}]})
+
+
+def frames_to_bitmap(frames, start_frame=0):
+    """帧号序列 → 位图（第 i 位表示 start_frame + i 帧有标注）"""
+    bitmap = 0
+    for frame in frames:
+        if frame is not None and frame >= start_frame:
+            bitmap |= 1 << (frame - start_frame)
+    return bitmap
+
+
+def bitmap_count(bitmap):
+    """位图中有标注的帧数"""
+    return bin(bitmap).count('1')
+
+
+def bitmap_frames(bitmap, start_frame=0):
+    """位图 → 有标注的帧号（升序），只遍历置位的位"""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield start_frame + lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+def summarize_annotations(data, start_frame=0):
+    """统计标注数据：shapes数、tracks数、有标注的帧数及帧位图
+
+    帧直接记入位图（每个job一个整数），不再为每个job构建帧号集合。
+    track按关键帧计（与shapes一样取shape的frame字段）。
+    """
+    shapes = data.get('shapes', [])
+    tracks = data.get('tracks', [])
+
+    frames = chain(
+        (shape.get('frame') for shape in shapes),
+        # track的shapes里也有frame
+        (shape.get('frame') for track in tracks for shape in track.get('shapes', [])),
+    )
+    bitmap = frames_to_bitmap(frames, start_frame)
+
+    return {
+        'shapes': len(shapes),
+        'tracks': len(tracks),
+        'annotated_frames': bitmap_count(bitmap),
+        'frame_bitmap': bitmap,
+    }
+
+
+def loads_json(raw):
+    """解析JSON（有orjson时用orjson）"""
+    if HAS_ORJSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class AnnotationCounter:
+    """从ijson事件流中统计标注：只取 shapes/tracks 的个数和 frame 字段"""
+
+    def __init__(self, start_frame=0):
+        self.start_frame = start_frame
+        self.shapes = 0
+        self.tracks = 0
+        self.bitmap = 0
+
+    def feed(self, prefix, event, value):
+        if event == 'start_map':
+            if prefix == 'shapes.item':
+                self.shapes += 1
+            elif prefix == 'tracks.item':
+                self.tracks += 1
+        elif prefix == 'shapes.item.frame' or prefix == 'tracks.item.shapes.item.frame':
+            if value is not None and value >= self.start_frame:
+                self.bitmap |= 1 << (value - self.start_frame)
+
+    def summary(self):
+        return {
+            'shapes': self.shapes,
+            'tracks': self.tracks,
+            'annotated_frames': bitmap_count(self.bitmap),
+            'frame_bitmap': self.bitmap,
+        }
+
+
+def should_stream_parse(content_length):
+    return HAS_IJSON and content_length is not None and content_length >= STREAM_PARSE_MIN_BYTES
+
+
+def summarize_annotation_stream(fileobj, start_frame=0):
+    """流式统计标注（同步文件对象）"""
+    counter = AnnotationCounter(start_frame)
+    for prefix, event, value in ijson_backend.parse(fileobj):
+        counter.feed(prefix, event, value)
+    return counter.summary()
+
+
+async def summarize_annotation_stream_async(reader, start_frame=0):
+    """流式统计标注（异步流，如aiohttp的response.content）"""
+    counter = AnnotationCounter(start_frame)
+    async for prefix, event, value in ijson_backend.parse_async(reader):
+        counter.feed(prefix, event, value)
+    return counter.summary()
+
+
+def create_session(headers, pool_size):
+    """创建带keep-alive连接池的Session"""
+    session = requests.Session()
+    session.headers.update(headers)
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class BaseCVATClient:
+    """CVAT客户端基类 - 持有共享的Session，各脚本的CVATClient继承它"""
+
+    def __init__(self, base_url, api_key, http_config=None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.headers = {'Authorization': f'Token {api_key}'}
+
+        http = get_http_config({'http': http_config})
+        self.max_workers = http['max_workers']
+        self.pool_size = http['pool_size']
+        self.engine = http['engine']
+        self.async_concurrency = http['async_concurrency']
+        self.session = create_session(self.headers, self.pool_size)
+
+        # 调度器的并发上限即扫描引擎的并发数，限流时在此范围内自动收缩/恢复
+        max_concurrency = self.async_concurrency if self.engine == 'async' else self.max_workers
+        self.scheduler = RequestScheduler(
+            max_concurrency,
+            max_retries=http['max_retries'],
+            backoff_base=http['backoff_base'],
+            backoff_max=http['backoff_max'],
+        )
+
+    def request(self, method, url, retry=True, **kwargs):
+        """发送请求：经过调度器控制并发，限流/临时错误自动退避重试
+
+        GET 遇到 429/5xx 和连接错误都会重试；POST/PATCH 只在 429 时重试
+        （请求未被处理，重发是安全的）。重试用尽后返回最后一次响应，
+        由调用方 raise_for_status() 报错，不会把失败当成空结果。
+        """
+        kwargs.setdefault('timeout', 30)
+        idempotent = method.upper() in ('GET', 'HEAD')
+        scheduler = self.scheduler
+
+        attempt = 0
+        while True:
+            window = scheduler.acquire()
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not (retry and idempotent) or attempt >= scheduler.max_retries:
+                    telemetry.record(method, url, None, time.monotonic() - started, retries=attempt)
+                    raise
+                delay = scheduler.backoff_delay(attempt)
+                logger.debug(f"请求失败，{delay:.1f}秒后重试 ({attempt + 1}/{scheduler.max_retries}): {url}, {e}")
+            else:
+                if not scheduler.should_retry(response.status_code):
+                    scheduler.on_success()
+                    self._record(method, url, response, started, attempt, kwargs.get('stream', False))
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                scheduler.on_throttle(response.status_code, retry_after, window)
+                retryable = idempotent or response.status_code == 429
+                if not (retry and retryable) or attempt >= scheduler.max_retries:
+                    self._record(method, url, response, started, attempt, kwargs.get('stream', False))
+                    return response
+                response.close()  # 流式请求时归还连接
+                delay = scheduler.backoff_delay(attempt, retry_after)
+                logger.debug(f"HTTP {response.status_code}，{delay:.1f}秒后重试 ({attempt + 1}/{scheduler.max_retries}): {url}")
+            finally:
+                scheduler.release()
+
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _record(method, url, response, started, retries, stream=False):
+        """记录请求统计；流式响应（stream=True）此时只收到响应头，耗时到响应头为止，字节数取Content-Length"""
+        content_length = response.headers.get('Content-Length')
+        if content_length:
+            nbytes = int(content_length)
+        elif not stream:
+            nbytes = len(response.content)
+        else:
+            nbytes = 0
+        telemetry.record(method, url, response.status_code, time.monotonic() - started, nbytes, retries)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def get_page(self, url, params=None):
+        """获取列表接口的一页（失败时抛出异常）"""
+        response = self.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def iter_pages(self, url, params=None):
+        """流式分页：第一页读出count后并发获取其余页，按页序逐条产出结果
+
+        第一页到达后立即开始产出，下游（如标注检查）不必等最后一页。
+        预取窗口为并发数的2倍，内存占用与总页数无关。
+        """
+        params = dict(params or {})
+        params['page'] = 1
+        data = self.get_page(url, params)
+        results = data.get('results', [])
+        yield from results
+
+        if not data.get('next') or not results:
+            return
+
+        count = data.get('count')
+        if count is not None:
+            # 服务器可能会截断page_size，以实际返回条数为准
+            last_page = math.ceil(count / len(results))
+            pages = iter(range(2, last_page + 1))
+            window = deque()
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            try:
+                for page in pages:
+                    window.append(executor.submit(self.get_page, url, {**params, 'page': page}))
+                    if len(window) >= self.max_workers * 2:
+                        break
+                while window:
+                    try:
+                        data = window.popleft().result()
+                    except requests.exceptions.HTTPError as e:
+                        # 遍历期间数据变少，末尾的页已不存在
+                        if e.response is None or e.response.status_code != 404:
+                            raise
+                        data = {}
+                    yield from data.get('results', [])
+                    page = next(pages, None)
+                    if page is not None:
+                        window.append(executor.submit(self.get_page, url, {**params, 'page': page}))
+            finally:
+                for future in window:
+                    future.cancel()
+                executor.shutdown(wait=False)
+
+        # 没有count，或遍历期间又新增了数据：顺着next继续取
+        while data.get('next'):
+            data = self.get_page(data['next'])
+            yield from data.get('results', [])
+
+    def iter_tasks(self, organization_slug=None, updated_since=None):
+        """流式获取所有任务（自动翻页）；指定updated_since时只返回此后修改过的任务"""
+        url = f'{self.base_url}/api/tasks'
+        params = {'page_size': 500}
+        if organization_slug:
+            params['org'] = organization_slug
+        if updated_since:
+            params['filter'] = updated_since_filter(updated_since)
+            params['sort'] = 'updated_date'
+        yield from self.iter_pages(url, params)
+
+    def iter_memberships(self, organization_slug):
+        """流式获取组织成员（自动翻页）"""
+        url = f'{self.base_url}/api/memberships'
+        yield from self.iter_pages(url, {'org': organization_slug, 'page_size': 100})
+
+    def iter_task_jobs(self, task_id):
+        """流式获取任务的所有jobs（自动翻页）"""
+        url = f'{self.base_url}/api/jobs'
+        yield from self.iter_pages(url, {'task_id': task_id, 'page_size': 1000})
+
+    def iter_org_jobs(self, organization_slug, updated_since=None):
+        """流式获取组织内所有任务的jobs（一次分页列出，不再逐任务请求）；指定updated_since时只返回此后修改过的jobs"""
+        url = f'{self.base_url}/api/jobs'
+        params = {'org': organization_slug, 'page_size': 1000}
+        if updated_since:
+            params['filter'] = updated_since_filter(updated_since)
+            params['sort'] = 'updated_date'
+        yield from self.iter_pages(url, params)
+
+    def get_task(self, task_id):
+        """获取单个任务（失败时抛出异常，由调用方处理）"""
+        url = f'{self.base_url}/api/tasks/{task_id}'
+        response = self.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    def get_job_annotation_summary(self, job_id, start_frame=0):
+        """获取job的标注统计（失败时抛出异常，由调用方处理）
+
+        大响应边下载边统计，不在内存中构建完整的标注对象树。
+        """
+        url = f'{self.base_url}/api/jobs/{job_id}/annotations'
+        response = self.get(url, stream=True)
+        with response:
+            response.raise_for_status()
+            content_length = response.headers.get('Content-Length')
+            if should_stream_parse(int(content_length) if content_length else None):
+                response.raw.decode_content = True
+                return summarize_annotation_stream(response.raw, start_frame)
+            return summarize_annotations(loads_json(response.content), start_frame)
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
@@ -2,11 +2,12 @@
 """
 生成 job 和 session 的映射文件
 """
-import requests
 import json
 from pathlib import Path
 from collections import defaultdict
 
+from cvat_client import BaseCVATClient
+
 def extract_session_id(filename):
     """提取session ID"""
     basename = filename.split('/')[-1]
@@ -25,7 +26,7 @@ def generate_mapping(cvat_url, api_key, task_id, data_file):
     print(f"生成任务 {task_id} 的 Job-Session 映射")
     print(f"{'='*60}\n")
     
-    headers = {'Authorization': f'Token {api_key}'}
+    client = BaseCVATClient(cvat_url, api_key)
     
     # 1. 读取原始数据，按session分组
     print(f"📖 读取数据: {data_file}")
@@ -44,14 +45,7 @@ def generate_mapping(cvat_url, api_key, task_id, data_file):
     
     # 2. 获取任务的所有 jobs
     print(f"\n📋 获取任务的 jobs...")
-    url = f'{cvat_url}/api/jobs'
-    params = {'task_id': task_id, 'page_size': 1000}
-    
-    response = requests.get(url, headers=headers, params=params, timeout=30)
-    response.raise_for_status()
-    
-    jobs_data = response.json()
-    jobs = jobs_data.get('results', [])
+    jobs = list(client.iter_task_jobs(task_id))
     
     print(f"   找到 {len(jobs)} 个 jobs")
     
@@ -11,6 +11,10 @@ from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+from cvat_client import BaseCVATClient
+from state_store import save_imported_frames
+from status_report import importable_new_images
+
 # 配置日志
 log_dir = Path('logs')
 log_dir.mkdir(exist_ok=True)
@@ -27,13 +31,11 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class CVATClient:
+class CVATClient(BaseCVATClient):
     """CVAT REST API客户端"""
     
-    def __init__(self, base_url, api_key):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.headers = {'Authorization': f'Token {api_key}'}
+    def __init__(self, base_url, api_key, http_config=None):
+        super().__init__(base_url, api_key, http_config)
         logger.info(f"初始化CVAT客户端: {base_url}")
     
     def create_task(self, name, labels, organization_slug=None):
@@ -50,7 +52,7 @@ class CVATClient:
         headers = {**self.headers, 'Content-Type': 'application/json'}
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = self.post(url, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             task = response.json()
             logger.info(f"✅ 任务创建成功: ID={task['id']}, Name={name}")
@@ -83,7 +85,7 @@ class CVATClient:
         headers = {**self.headers, 'Content-Type': 'application/json'}
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=120)
+            response = self.post(url, headers=headers, json=payload, timeout=120)
             response.raise_for_status()
             result = response.json()
             logger.info(f"✅ 数据加载请求已提交: task_id={task_id}")
@@ -99,7 +101,7 @@ class CVATClient:
         url = f'{self.base_url}/api/tasks/{task_id}'
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self.get(url, timeout=30)
             response.raise_for_status()
             task = response.json()
             return task.get('status'), task.get('size', 0)
@@ -142,14 +144,8 @@ class CVATClient:
     
     def get_task_jobs(self, task_id):
         """获取任务的所有jobs"""
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id, 'page_size': 1000}
-        
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            jobs_data = response.json()
-            jobs = jobs_data.get('results', [])
+            jobs = list(self.iter_task_jobs(task_id))
             jobs.sort(key=lambda x: x.get('start_frame', 0))
             return jobs
         except requests.exceptions.RequestException as e:
@@ -166,7 +162,7 @@ class CVATClient:
         
         try:
             # PATCH更新
-            response = requests.patch(url, headers=headers, json=payload, timeout=30)
+            response = self.patch(url, headers=headers, json=payload, timeout=30)
             response.raise_for_status()
             
             logger.info(f"   ✓ Job {job_id} 已分配给用户 {assignee_id}")
@@ -183,10 +179,7 @@ class CVATClient:
         params = {'org': organization_slug, 'page_size': 100}
         
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            members = data.get('results', [])
+            members = list(self.iter_pages(url, params))
             
             logger.info(f"✅ 获取组织成员: {len(members)} 人")
             return members
@@ -287,8 +280,12 @@ def import_new_data(config_file='config.json', new_images_file=None):
     
     logger.info(f"\n📖 读取新数据文件列表: {new_images_file}")
     
-    with open(new_images_file, 'r', encoding='utf-8') as f:
-        new_files = [line.strip() for line in f if line.strip()]
+    if str(new_images_file).endswith('.json'):
+        # 状态报告：只读明细中可导入chunk的 new_images
+        new_files = list(importable_new_images(new_images_file))
+    else:
+        with open(new_images_file, 'r', encoding='utf-8') as f:
+            new_files = [line.strip() for line in f if line.strip()]
     
     if not new_files:
         logger.info("✅ 没有新数据需要导入")
@@ -315,7 +312,7 @@ def import_new_data(config_file='config.json', new_images_file=None):
     logger.info(f"✅ 分组完成: {len(job_file_mapping)} 个jobs, {len(all_files)} 张图片")
     
     # 5. 创建CVAT客户端
-    client = CVATClient(cvat_url, api_key)
+    client = CVATClient(cvat_url, api_key, config.get('http'))
     
     # 6. 创建任务
     task_name = f"New Data Import - {datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -348,6 +345,11 @@ def import_new_data(config_file='config.json', new_images_file=None):
         logger.error(f"❌ 数据加载超时或失败")
         return
     
+    # 按 job_file_mapping 加载时帧顺序就是各job文件依次排列，保存帧索引供核对状态使用
+    # （自然排序由CVAT完成，顺序无法确定，核对时从 data/meta 获取）
+    if use_job_mapping:
+        save_imported_frames(config, task_id, all_files)
+    
     # 9. 获取jobs并分配
     logger.info(f"\n👥 分配任务...")
     jobs = client.get_task_jobs(task_id)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+并发扫描jobs的标注数据 - 各检查脚本共享的扫描引擎
+- threads: 线程池 + 共享连接池Session（默认，无额外依赖）
+- async:   aiohttp异步引擎，单线程内维持数百个在途请求
+
+所有任务的jobs流入同一个有界队列：一边列出任务的jobs一边检查标注，
+不再按任务逐个开线程池，并发度在整个组织范围内保持饱和。
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+from cvat_client import (loads_json, should_stream_parse, summarize_annotation_stream_async,
+                         summarize_annotations)
+from request_scheduler import parse_retry_after
+from request_telemetry import telemetry
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+logger = logging.getLogger(__name__)
+
+# 队列结束标记
+_DONE = object()
+
+# 任务数达到此值时改为按组织一次列出所有jobs；任务很少时逐任务列出更省
+BULK_MIN_TASKS = 5
+
+
+def scan_tasks(client, tasks, on_progress=None, organization_slug=None, cache=None, resolve=None):
+    """流式扫描多个任务：列出任务的jobs，jobs立即进入全局队列检查标注
+
+    提供organization_slug且任务数较多时，用 /api/jobs?org= 一次分页列出整个组织的jobs，
+    在本地按task_id分组，只保留tasks中的任务（已排除的任务、--task-ids之外的任务都会被过滤）。
+
+    Args:
+        client: BaseCVATClient 实例（用 iter_task_jobs / iter_org_jobs 流式翻页）
+        tasks: 任务字典列表
+        on_progress: 可选回调 on_progress(completed, total)，total为目前已入队的jobs数
+        organization_slug: 组织slug，不提供时逐任务列出jobs
+        cache: 可选的 AnnotationCache，updated_date未变的job直接用缓存
+        resolve: 可选回调 resolve(job)，返回非None时直接作为该job的结果，不再请求
+
+    Returns:
+        (task_jobs, summaries)
+        task_jobs: {task_id: [job, ...]}，按任务重新分组，供各脚本输出按任务的统计；
+                   jobs列表获取失败的任务不在其中（不把不完整的列表当成全部jobs）
+        summaries: {job_id: 标注统计或None}
+    """
+    task_jobs = {}
+
+    def org_job_stream():
+        for task in tasks:
+            task_jobs[task['id']] = []
+        try:
+            for job in client.iter_org_jobs(organization_slug):
+                jobs = task_jobs.get(job.get('task_id'))
+                if jobs is None:
+                    continue
+                jobs.append(job)
+                yield job
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ 获取组织jobs失败: {e}")
+            task_jobs.clear()
+
+    def job_stream():
+        # 每页jobs到达即入队，大任务不必等最后一页
+        for task in tasks:
+            jobs = task_jobs[task['id']] = []
+            try:
+                for job in client.iter_task_jobs(task['id']):
+                    jobs.append(job)
+                    yield job
+            except requests.exceptions.RequestException as e:
+                logger.error(f"❌ 获取jobs失败: task_id={task['id']}, {e}")
+                del task_jobs[task['id']]
+
+    if organization_slug and len(tasks) >= BULK_MIN_TASKS:
+        stream = org_job_stream()
+    else:
+        stream = job_stream()
+    summaries = scan_job_annotations(client, stream, on_progress, cache, resolve)
+    return task_jobs, summaries
+
+
+def scan_job_annotations(client, jobs, on_progress=None, cache=None, resolve=None):
+    """并发获取一批jobs的标注统计
+
+    Args:
+        client: BaseCVATClient 实例（提供连接池和并发配置）
+        jobs: job字典的可迭代对象（列表或生成器，生成器会被边产出边消费）
+        on_progress: 可选回调 on_progress(completed, total)
+        cache: 可选的 AnnotationCache，命中的job不再请求，新获取的结果写回缓存
+        resolve: 可选回调 resolve(job)，在查缓存之前调用，返回非None时不再请求
+
+    Returns:
+        {job_id: {'shapes', 'tracks', 'annotated_frames', 'frame_bitmap'}}，获取失败的job值为None
+    """
+    engine = client.engine
+    if engine == 'async' and not HAS_AIOHTTP:
+        logger.warning("⚠️  aiohttp未安装，异步引擎不可用，改用线程池")
+        logger.info("💡 安装: pip install aiohttp")
+        engine = 'threads'
+
+    progress = _Progress(on_progress)
+    known = {}
+    fetched_jobs = {}
+    cache_hits = 0
+
+    def pending_jobs():
+        # 已能确定结果的job（resolve / 缓存命中）直接计入，只有其余的进入请求队列
+        nonlocal cache_hits
+        for job in jobs:
+            summary = resolve(job) if resolve else None
+            if summary is None and cache:
+                summary = cache.get(job)
+                cache_hits += summary is not None
+            if summary is not None:
+                known[job['id']] = summary
+                progress.add_queued()
+                progress.add_completed()
+            else:
+                fetched_jobs[job['id']] = job
+                yield job
+
+    if engine == 'async':
+        results = asyncio.run(_scan_async(client, pending_jobs(), progress))
+    else:
+        results = _scan_threads(client, pending_jobs(), progress)
+
+    if cache:
+        cache.put_many((fetched_jobs[job_id], summary) for job_id, summary in results.items())
+        logger.info(f"💾 标注缓存: 命中 {cache_hits} 个jobs，重新获取 {len(fetched_jobs)} 个")
+
+    results.update(known)
+    return results
+
+
+class _Progress:
+    """线程安全的进度计数"""
+
+    def __init__(self, on_progress):
+        self.on_progress = on_progress
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.completed = 0
+
+    def add_queued(self):
+        with self.lock:
+            self.queued += 1
+
+    def add_completed(self):
+        with self.lock:
+            self.completed += 1
+            if self.on_progress:
+                self.on_progress(self.completed, self.queued)
+
+
+def _scan_threads(client, jobs, progress):
+    """线程池引擎 - 固定数量的worker从有界队列取job"""
+    job_queue = queue.Queue(maxsize=client.max_workers * 2)
+    results = {}
+
+    def worker():
+        while True:
+            job = job_queue.get()
+            if job is _DONE:
+                return
+            job_id = job['id']
+            try:
+                summary = client.get_job_annotation_summary(job_id, job.get('start_frame', 0))
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"检查job {job_id}失败: {e}")
+                summary = None
+            except Exception as e:
+                # 不能让worker线程退出，否则队列无人消费会卡住生产者
+                logger.error(f"❌ 检查job {job_id}异常: {e}")
+                summary = None
+            results[job_id] = summary
+            progress.add_completed()
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(client.max_workers)]
+    for t in workers:
+        t.start()
+
+    try:
+        for job in jobs:
+            progress.add_queued()
+            job_queue.put(job)
+    finally:
+        for _ in workers:
+            job_queue.put(_DONE)
+        for t in workers:
+            t.join()
+
+    return results
+
+
+async def _scan_async(client, jobs, progress):
+    """aiohttp异步引擎 - 生产者在后台线程列出jobs，固定数量的协程消费"""
+    concurrency = client.async_concurrency
+    job_queue = asyncio.Queue(maxsize=concurrency * 2)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=30)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    def produce():
+        # jobs可能是会发起HTTP请求的生成器，放在线程里跑，避免阻塞事件循环
+        try:
+            for job in jobs:
+                progress.add_queued()
+                asyncio.run_coroutine_threadsafe(job_queue.put(job), loop).result()
+        finally:
+            for _ in range(concurrency):
+                asyncio.run_coroutine_threadsafe(job_queue.put(_DONE), loop).result()
+
+    async with aiohttp.ClientSession(headers=client.headers, connector=connector,
+                                     timeout=timeout) as session:
+        async def worker():
+            while True:
+                job = await job_queue.get()
+                if job is _DONE:
+                    return
+                job_id = job['id']
+                try:
+                    results[job_id] = await _fetch_summary_async(client, session, job)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.debug(f"检查job {job_id}失败: {e}")
+                    results[job_id] = None
+                except Exception as e:
+                    # 同线程引擎：worker不能退出，否则队列无人消费会卡住生产者
+                    logger.error(f"❌ 检查job {job_id}异常: {e}")
+                    results[job_id] = None
+                progress.add_completed()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await loop.run_in_executor(None, produce)
+        finally:
+            await asyncio.gather(*workers)
+
+    return results
+
+
+async def _fetch_summary_async(client, session, job):
+    """异步获取单个job的标注统计，和同步请求共用调度器（限流退避 + AIMD）"""
+    job_id = job['id']
+    url = f'{client.base_url}/api/jobs/{job_id}/annotations'
+    scheduler = client.scheduler
+
+    attempt = 0
+    while True:
+        window = await scheduler.acquire_async()
+        started = time.monotonic()
+        final = False
+        try:
+            async with session.get(url) as response:
+                final = not scheduler.should_retry(response.status) or attempt >= scheduler.max_retries
+                if final:
+                    # 和同步引擎的流式请求一致：耗时记到收到响应头为止
+                    telemetry.record('GET', url, response.status, time.monotonic() - started,
+                                     response.content_length, attempt)
+                if not scheduler.should_retry(response.status):
+                    response.raise_for_status()
+                    start_frame = job.get('start_frame', 0)
+                    if should_stream_parse(response.content_length):
+                        summary = await summarize_annotation_stream_async(response.content, start_frame)
+                    else:
+                        summary = summarize_annotations(loads_json(await response.read()), start_frame)
+                    scheduler.on_success()
+                    return summary
+
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                scheduler.on_throttle(response.status, retry_after, window)
+                if attempt >= scheduler.max_retries:
+                    response.raise_for_status()
+                delay = scheduler.backoff_delay(attempt, retry_after)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt >= scheduler.max_retries:
+                if not final:
+                    telemetry.record('GET', url, None, time.monotonic() - started, retries=attempt)
+                raise
+            delay = scheduler.backoff_delay(attempt)
+        finally:
+            scheduler.release()
+
+        logger.debug(f"job {job_id} 第{attempt + 1}次重试，等待{delay:.1f}秒")
+        await asyncio.sleep(delay)
+        attempt += 1
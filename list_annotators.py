@@ -3,10 +3,11 @@
 列出组织中的标注人员
 自动识别权限较低的成员（通常是标注人员）
 """
-import requests
 import json
 import sys
 
+from cvat_client import BaseCVATClient
+
 def list_annotators(config_file='config.json'):
     """列出标注人员"""
     print("="*60)
@@ -30,7 +31,7 @@ def list_annotators(config_file='config.json'):
         print("❌ 配置中未找到组织slug")
         return
     
-    headers = {'Authorization': f'Token {api_key}'}
+    client = BaseCVATClient(cvat_url, api_key, config.get('http'))
     
     # 2. 获取组织成员
     print(f"\n👥 获取组织成员...")
@@ -38,10 +39,7 @@ def list_annotators(config_file='config.json'):
     params = {'org': organization_slug, 'page_size': 100}
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        members = data.get('results', [])
+        members = list(client.iter_pages(url, params))
         
         print(f"✅ 找到 {len(members)} 个成员\n")
         
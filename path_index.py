@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+路径整数编码 - 云存储与CVAT图片路径对比用
+b1e0/session_20260108_034622_359267/0000/down/labels/.../frame_00089.jpg 这样的路径
+几乎只有文件名不同：目录和文件名各只保存一份，每个路径编码为一个整数
+（目录编号 << 32 | 文件名编号）。集合里存整数而不是完整字符串，内存小几倍，
+集合差（新数据 = 云存储 - CVAT）比较的是整数，不再逐字符比较长字符串。
+同一次对比的所有集合必须用同一个 PathIndex 编码。
+"""
+
+NAME_BITS = 32
+NAME_MASK = (1 << NAME_BITS) - 1
+
+
+class PathIndex:
+    """路径 ↔ 整数编码（目录和文件名分别驻留）"""
+
+    def __init__(self):
+        self._dir_ids = {}
+        self._dirs = []
+        self._name_ids = {}
+        self._names = []
+
+    def __len__(self):
+        """已驻留的目录数"""
+        return len(self._dirs)
+
+    def encode(self, path):
+        """路径 → 整数编码，新的目录/文件名自动加入"""
+        split = path.rfind('/') + 1
+        dirname, name = path[:split], path[split:]
+
+        dir_id = self._dir_ids.get(dirname)
+        if dir_id is None:
+            dir_id = self._dir_ids[dirname] = len(self._dirs)
+            self._dirs.append(dirname)
+
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self._names)
+            self._names.append(name)
+
+        return dir_id << NAME_BITS | name_id
+
+    def decode(self, code):
+        """整数编码 → 路径"""
+        return self._dirs[code >> NAME_BITS] + self._names[code & NAME_MASK]
+
+    def decode_sorted(self, codes):
+        """一组编码 → 排序后的路径列表（输出报告用）"""
+        return sorted(map(self.decode, codes))
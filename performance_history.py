@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+绩效历史库（SQLite，只追加）- 每次运行记录一次每个人、每个job的累计计数
+- 替代 reports/snapshots/daily_*.json：不再只能和"正好昨天"比较
+- 任意时间窗口的增量：今天、最近一周、漏跑一天之后、按小时
+- 一次查询读出整段历史，不必逐个解析JSON文件
+- 每次同步给每个job记一个标注计数采样点，按采样间的增量计算有效速度（帧/实际工作小时）
+
+用法:
+    python performance_history.py                       # 最近7天每天的标注帧数增量
+    python performance_history.py --since 30d           # 最近30天，按天
+    python performance_history.py --since 24h --step 1h # 最近24小时，按小时
+"""
+import bisect
+import json
+import logging
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = 'reports/performance_history.db'
+
+# 每人累计计数的列（增量按这些列计算）
+USER_COUNTERS = ('total_frames', 'annotated_frames', 'total_shapes',
+                 'total_jobs', 'completed_jobs', 'in_progress_jobs')
+
+# 每个job累计计数的列
+JOB_COLUMNS = ('job_id', 'task_id', 'user', 'frame_count', 'annotated_frames', 'shapes', 'status', 'speed')
+
+# 相邻两次采样间隔超过此值时无法判断其间实际工作了多久，这段的产出不计入有效速度
+MAX_SAMPLE_GAP = timedelta(hours=2)
+
+# 有效速度默认统计最近一段时间的采样
+ACTIVE_SPEED_WINDOW = timedelta(days=7)
+
+
+def parse_duration(text):
+    """解析 7d / 24h / 30m 形式的时长"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([dhm])', text.strip())
+    if not match:
+        raise ValueError(f"无法识别的时长: {text}（示例: 7d, 24h, 30m）")
+    unit = {'d': 'days', 'h': 'hours', 'm': 'minutes'}[match.group(2)]
+    return timedelta(**{unit: float(match.group(1))})
+
+
+def _format_time(dt):
+    return dt.isoformat(sep=' ', timespec='seconds')
+
+
+def task_scope(task_ids):
+    """运行范围：全部任务为空串，指定任务时为排序后的任务ID；只和同一范围的记录计算增量"""
+    return ','.join(str(tid) for tid in sorted(set(task_ids))) if task_ids else ''
+
+
+class PerformanceHistory:
+    """绩效历史：runs 每次运行一行，user_counters / job_counters 为该次运行的累计计数"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY,
+                recorded_at TEXT NOT NULL,
+                scope TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS runs_recorded_at ON runs (scope, recorded_at);
+            CREATE TABLE IF NOT EXISTS user_counters (
+                run_id INTEGER NOT NULL,
+                user TEXT NOT NULL,
+                total_frames INTEGER NOT NULL,
+                annotated_frames INTEGER NOT NULL,
+                total_shapes INTEGER NOT NULL,
+                total_jobs INTEGER NOT NULL,
+                completed_jobs INTEGER NOT NULL,
+                in_progress_jobs INTEGER NOT NULL,
+                avg_speed REAL,
+                PRIMARY KEY (run_id, user)
+            );
+            CREATE TABLE IF NOT EXISTS job_counters (
+                run_id INTEGER NOT NULL,
+                job_id INTEGER NOT NULL,
+                task_id INTEGER NOT NULL,
+                user TEXT,
+                frame_count INTEGER NOT NULL,
+                annotated_frames INTEGER NOT NULL,
+                shapes INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                speed REAL,
+                PRIMARY KEY (run_id, job_id)
+            );
+            CREATE INDEX IF NOT EXISTS job_counters_job_id ON job_counters (job_id, run_id);
+            CREATE TABLE IF NOT EXISTS job_samples (
+                job_id INTEGER NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL,
+                assignee_id INTEGER,
+                annotated_frames INTEGER NOT NULL,
+                shapes INTEGER NOT NULL,
+                PRIMARY KEY (job_id, first_seen)
+            );
+            CREATE INDEX IF NOT EXISTS job_samples_first_seen ON job_samples (first_seen);
+        ''')
+        self.conn.commit()
+
+    # ---------- 写入 ----------
+
+    def record_run(self, users, jobs=(), recorded_at=None, scope=''):
+        """追加一次运行的记录，一个事务提交
+
+        Args:
+            users: {user: {USER_COUNTERS..., 'avg_speed'}}
+            jobs: [{JOB_COLUMNS...}, ...]
+            recorded_at: 记录时间（datetime，默认现在）
+            scope: task_scope() 的结果
+
+        Returns:
+            run_id
+        """
+        recorded_at = _format_time(recorded_at or datetime.now())
+        with self.conn:
+            run_id = self.conn.execute(
+                'INSERT INTO runs (recorded_at, scope) VALUES (?, ?)', (recorded_at, scope)
+            ).lastrowid
+            self.conn.executemany(
+                'INSERT INTO user_counters (run_id, user, total_frames, annotated_frames, total_shapes, '
+                'total_jobs, completed_jobs, in_progress_jobs, avg_speed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run_id, user, *(data.get(name, 0) for name in USER_COUNTERS), data.get('avg_speed'))
+                 for user, data in users.items()]
+            )
+            self.conn.executemany(
+                'INSERT INTO job_counters (run_id, job_id, task_id, user, frame_count, annotated_frames, '
+                'shapes, status, speed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run_id, *(job.get(name) for name in JOB_COLUMNS)) for job in jobs]
+            )
+        return run_id
+
+    def record_job_samples(self, samples, sampled_at):
+        """记录一次采样 [(job_id, assignee_id, annotated_frames, shapes), ...]
+
+        计数和负责人都没变的job只把最近一行的 last_seen 延后（游程编码），
+        所以一行代表一段没有变化的时间，库的大小与变化次数成正比而不是与采样次数成正比。
+        不晚于已有记录的采样（同一次同步重复记录、离线报告）被忽略。
+
+        Returns:
+            新增的行数
+        """
+        sampled_at = _format_time(sampled_at)
+        latest = {
+            row[0]: row[1:]
+            for row in self.conn.execute(
+                'SELECT job_id, MAX(first_seen), last_seen, assignee_id, annotated_frames, shapes '
+                'FROM job_samples GROUP BY job_id'
+            )
+        }
+
+        inserts, extends = [], []
+        for job_id, assignee_id, annotated_frames, shapes in samples:
+            previous = latest.get(job_id)
+            if previous is not None and sampled_at <= previous[1]:
+                continue
+            if previous is not None and previous[2:] == (assignee_id, annotated_frames, shapes):
+                extends.append((sampled_at, job_id, previous[0]))
+            else:
+                inserts.append((job_id, sampled_at, sampled_at, assignee_id, annotated_frames, shapes))
+
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE job_samples SET last_seen = ? WHERE job_id = ? AND first_seen = ?', extends
+            )
+            self.conn.executemany(
+                'INSERT INTO job_samples (job_id, first_seen, last_seen, assignee_id, annotated_frames, shapes) '
+                'VALUES (?, ?, ?, ?, ?, ?)', inserts
+            )
+        return len(inserts)
+
+    def import_snapshots(self, snapshot_dir):
+        """导入旧的每日快照（reports/snapshots/daily_*.json），只在历史库为空时使用"""
+        imported = 0
+        for snapshot_file in sorted(Path(snapshot_dir).glob('daily_*.json')):
+            try:
+                with open(snapshot_file, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                recorded_at = datetime.fromisoformat(snapshot['generated_at'])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"⚠️  跳过无法读取的快照 {snapshot_file}: {e}")
+                continue
+            self.record_run(snapshot.get('users', {}), recorded_at=recorded_at)
+            imported += 1
+        return imported
+
+    # ---------- 查询 ----------
+
+    def count_runs(self, scope=''):
+        return self.conn.execute('SELECT COUNT(*) FROM runs WHERE scope = ?', (scope,)).fetchone()[0]
+
+    def has_run(self, recorded_at, scope=''):
+        """是否已有该时间的运行记录（同一次同步的数据只记录一次）"""
+        return self.conn.execute(
+            'SELECT 1 FROM runs WHERE scope = ? AND recorded_at = ? LIMIT 1', (scope, _format_time(recorded_at))
+        ).fetchone() is not None
+
+    def find_run(self, at, scope=''):
+        """at 之前（含）最近的一次运行，返回 (run_id, recorded_at)，没有时返回None"""
+        return self.conn.execute(
+            'SELECT run_id, recorded_at FROM runs WHERE scope = ? AND recorded_at <= ? '
+            'ORDER BY recorded_at DESC, run_id DESC LIMIT 1',
+            (scope, _format_time(at))
+        ).fetchone()
+
+    def user_counters(self, run_id):
+        """某次运行的每人计数 {user: {USER_COUNTERS..., 'avg_speed'}}"""
+        rows = self.conn.execute(
+            f'SELECT user, {", ".join(USER_COUNTERS)}, avg_speed FROM user_counters WHERE run_id = ?',
+            (run_id,)
+        ).fetchall()
+        return {user: dict(zip(USER_COUNTERS + ('avg_speed',), values)) for user, *values in rows}
+
+    def load_runs(self, since=None, until=None, scope=''):
+        """一次查询读出时间段内每次运行的每人计数
+
+        since 之前最近的一次运行也包含在内，作为第一个时间段的增量基准。
+
+        Returns:
+            [(recorded_at(datetime), {user: {USER_COUNTERS..., 'avg_speed'}}), ...]，按时间排序
+        """
+        start = ''
+        if since is not None:
+            baseline = self.find_run(since, scope)
+            start = baseline[1] if baseline else _format_time(since)
+        end = _format_time(until or datetime.now())
+
+        rows = self.conn.execute(
+            f'SELECT r.run_id, r.recorded_at, u.user, {", ".join("u." + name for name in USER_COUNTERS)}, '
+            'u.avg_speed FROM runs r JOIN user_counters u ON u.run_id = r.run_id '
+            'WHERE r.scope = ? AND r.recorded_at >= ? AND r.recorded_at <= ? '
+            'ORDER BY r.recorded_at, r.run_id',
+            (scope, start, end)
+        ).fetchall()
+
+        runs = []
+        last_run_id = None
+        for run_id, recorded_at, user, *values in rows:
+            if run_id != last_run_id:
+                runs.append((datetime.fromisoformat(recorded_at), {}))
+                last_run_id = run_id
+            runs[-1][1][user] = dict(zip(USER_COUNTERS + ('avg_speed',), values))
+        return runs
+
+    def user_deltas(self, since, until=None, scope=''):
+        """since 到 until 之间每人的计数增量
+
+        基准是 since 之前（含）最近的一次运行，所以漏跑几天后得到的是这几天的累计增量。
+
+        Returns:
+            (baseline_at, {user: {counter: 增量}})，没有基准运行时 baseline_at 为None、结果为空
+        """
+        runs = self.load_runs(since, until, scope)
+        return _deltas_between(runs, since, until or datetime.now())
+
+    def bucket_deltas(self, since, step, until=None, scope=''):
+        """把 since 到 until 切成长度为 step 的时间段，返回每段每人的计数增量
+
+        Returns:
+            [(段开始, 段结束, {user: {counter: 增量}}), ...]
+        """
+        until = until or datetime.now()
+        runs = self.load_runs(since, until, scope)
+        buckets = []
+        start = since
+        while start < until:
+            end = min(start + step, until)
+            buckets.append((start, end, _deltas_between(runs, start, end)[1]))
+            start = end
+        return buckets
+
+    def active_speeds(self, since, until=None):
+        """按采样增量计算每人的有效速度
+
+        相邻两行之间标注帧数增加，说明这段时间（上一行的 last_seen 到这一行的 first_seen）在工作；
+        计数没变的时间段（空闲、只改了评论或状态）不计入工作时长。同一人多个job的工作时段取并集。
+        间隔超过 MAX_SAMPLE_GAP 的增量无法确定工作时长，计入 unmeasured_frames，不参与速度计算。
+
+        Returns:
+            {assignee_id: {'frames', 'shapes', 'active_hours', 'speed', 'unmeasured_frames'}}
+        """
+        start = _format_time(since)
+        end = _format_time(until or datetime.now())
+        rows = self.conn.execute(
+            'SELECT job_id, first_seen, last_seen, assignee_id, annotated_frames, shapes FROM job_samples '
+            'WHERE job_id IN (SELECT job_id FROM job_samples WHERE first_seen > ? AND first_seen <= ?) '
+            'AND first_seen <= ? ORDER BY job_id, first_seen',
+            (start, end, end)
+        ).fetchall()
+
+        intervals = {}
+        totals = {}
+        previous = None
+        for row in rows:
+            job_id, first_seen, _, assignee_id, annotated_frames, shapes = row
+            if previous is not None and previous[0] == job_id and first_seen > start:
+                delta_frames = annotated_frames - previous[4]
+                if delta_frames > 0:
+                    stats = totals.setdefault(assignee_id, {'frames': 0, 'shapes': 0, 'unmeasured_frames': 0})
+                    work_start = datetime.fromisoformat(previous[2])
+                    work_end = datetime.fromisoformat(first_seen)
+                    if work_end - work_start > MAX_SAMPLE_GAP:
+                        stats['unmeasured_frames'] += delta_frames
+                    else:
+                        stats['frames'] += delta_frames
+                        stats['shapes'] += max(shapes - previous[5], 0)
+                        intervals.setdefault(assignee_id, []).append((work_start, work_end))
+            previous = row
+
+        for assignee_id, stats in totals.items():
+            hours = _union_seconds(intervals.get(assignee_id, [])) / 3600
+            stats['active_hours'] = round(hours, 2)
+            stats['speed'] = stats['frames'] / hours if hours > 0 else None
+        return totals
+
+    def close(self):
+        self.conn.close()
+
+
+def record_state_samples(history, state):
+    """把一次同步得到的每个job标注计数记为一个采样点（采样时间为同步时间），返回新增行数"""
+    if not state.get('synced_at'):
+        return 0
+
+    samples = []
+    for jobs in state['task_jobs'].values():
+        for job in jobs:
+            summary = state['summaries'].get(job['id'])
+            if summary is None:
+                continue
+            assignee = job.get('assignee')
+            samples.append((job['id'], assignee.get('id') if assignee else None,
+                            summary['annotated_frames'], summary['shapes']))
+    return history.record_job_samples(samples, datetime.fromisoformat(state['synced_at']))
+
+
+def _union_seconds(intervals):
+    """时间段并集的总秒数"""
+    total = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += (current_end - current_start).total_seconds()
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += (current_end - current_start).total_seconds()
+    return total
+
+
+def _run_at(runs, at):
+    """runs 中 at 之前（含）最近的一次运行"""
+    index = bisect.bisect_right([recorded_at for recorded_at, _ in runs], at)
+    return runs[index - 1] if index else None
+
+
+def _deltas_between(runs, start, end):
+    """两个时刻各自最近的运行之间每人的计数增量；基准中没有的人不计算（无法区分新人和旧数据）"""
+    baseline, latest = _run_at(runs, start), _run_at(runs, end)
+    if baseline is None or latest is None:
+        return None, {}
+
+    deltas = {}
+    for user, counters in latest[1].items():
+        previous = baseline[1].get(user)
+        if previous is not None:
+            deltas[user] = {name: counters[name] - previous[name] for name in USER_COUNTERS}
+    return baseline[0], deltas
+
+
+def main():
+    """命令行入口：按时间段输出每人的标注帧数增量"""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    args = sys.argv[1:]
+    options = {'--since': '7d', '--step': '1d'}
+    try:
+        while args:
+            name = args.pop(0)
+            if name not in options or not args:
+                raise ValueError(f"未知参数: {name}")
+            options[name] = args.pop(0)
+        since, step = parse_duration(options['--since']), parse_duration(options['--step'])
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        logger.info("用法: python performance_history.py [--since 7d] [--step 1d|1h]")
+        return
+
+    history = PerformanceHistory()
+    now = datetime.now()
+    buckets = history.bucket_deltas(now - since, step, now)
+    history.close()
+
+    users = sorted({user for _, _, deltas in buckets for user in deltas})
+    if not users:
+        logger.warning(f"⚠️  最近 {options['--since']} 没有可比较的记录: {history.path}")
+        return
+
+    logger.info(f"📊 标注帧数增量（每 {options['--step']}）")
+    logger.info("时间段".ljust(34) + "".join(user[:12].rjust(14) for user in users))
+    for start, end, deltas in buckets:
+        cells = "".join(str(deltas[user]['annotated_frames'] if user in deltas else '-').rjust(14)
+                        for user in users)
+        logger.info(f"{start:%m-%d %H:%M} ~ {end:%m-%d %H:%M}".ljust(34) + cells)
+
+
+if __name__ == "__main__":
+    main()
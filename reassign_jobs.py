@@ -3,13 +3,14 @@
 动态分配未开始的Jobs
 扫描所有任务，找出 annotated_frames == 0 的 jobs，重新分配给指定人员
 """
-import requests
 import json
 import logging
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cvat_client import BaseCVATClient
+from state_store import get_excluded_tasks, get_sync_config, open_state_store, sync_state
 
 # 配置日志
 log_dir = Path('logs')
@@ -20,77 +21,18 @@ logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
     handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.FileHandler(log_file, encoding='utf-8', delay=True),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
-# 排除的任务（旧平台）
-EXCLUDED_TASKS = {1967925}
-
 
-class CVATClient:
+class CVATClient(BaseCVATClient):
     """CVAT客户端"""
     
-    def __init__(self, base_url, api_key):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = api_key
-        self.headers = {'Authorization': f'Token {api_key}'}
-    
-    def get_all_tasks(self, organization_slug=None):
-        """获取所有任务"""
-        url = f'{self.base_url}/api/tasks'
-        params = {'page_size': 500}
-        if organization_slug:
-            params['org'] = organization_slug
-        
-        all_tasks = []
-        page = 1
-        
-        while True:
-            params['page'] = page
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            results = data.get('results', [])
-            all_tasks.extend(results)
-            
-            if not data.get('next'):
-                break
-            page += 1
-        
-        return all_tasks
-    
-    def get_task_jobs(self, task_id):
-        """获取任务的所有jobs"""
-        url = f'{self.base_url}/api/jobs'
-        params = {'task_id': task_id, 'page_size': 1000}
-        
-        response = requests.get(url, headers=self.headers, params=params, timeout=30)
-        response.raise_for_status()
-        return response.json().get('results', [])
-    
-    def get_job_annotations_count(self, job_id):
-        """获取job的已标注帧数"""
-        url = f'{self.base_url}/api/jobs/{job_id}/annotations'
-        
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            annotated_frames = set()
-            for shape in data.get('shapes', []):
-                annotated_frames.add(shape.get('frame'))
-            for track in data.get('tracks', []):
-                for shape in track.get('shapes', []):
-                    annotated_frames.add(shape.get('frame'))
-            
-            return len(annotated_frames)
-        except:
-            return -1  # 出错返回-1，表示无法确定
+    def __init__(self, base_url, api_key, http_config=None):
+        super().__init__(base_url, api_key, http_config)
     
     def assign_job(self, job_id, assignee_id):
         """分配job给标注人员"""
@@ -98,43 +40,88 @@ class CVATClient:
         payload = {'assignee': assignee_id}
         headers = {**self.headers, 'Content-Type': 'application/json'}
         
-        response = requests.patch(url, headers=headers, json=payload, timeout=30)
+        response = self.patch(url, headers=headers, json=payload, timeout=30)
         response.raise_for_status()
         return True
+
+
+def member_info(member):
+    """组织成员（memberships接口的原始数据）→ {'id', 'name', 'username', 'role'}"""
+    user = member.get('user', {})
+    role = member.get('role', 'worker')
+    
+    user_id = user.get('id')
+    username = user.get('username')
+    first_name = user.get('first_name', '')
+    last_name = user.get('last_name', '')
+    
+    if first_name or last_name:
+        display_name = f"{first_name} {last_name}".strip()
+    else:
+        display_name = username
+    
+    return {
+        'id': user_id,
+        'name': display_name,
+        'username': username,
+        'role': role
+    }
+
+
+def find_unstarted_jobs(state):
+    """按jobs状态统计每个人的工作量，找出可以重新分配的未开始jobs
+    
+    Args:
+        state: load_state/sync_state 的结果
+    
+    Returns:
+        (unstarted_jobs, user_started_jobs, failed_job_ids)
+    """
+    tasks = state['tasks']
+    task_jobs = state['task_jobs']
+    summaries = state['summaries']
     
-    def get_organization_members(self, organization_slug):
-        """获取组织所有成员（包括管理员）"""
-        url = f'{self.base_url}/api/memberships'
-        params = {'org': organization_slug, 'page_size': 100}
+    unstarted_jobs = []
+    user_started_jobs = defaultdict(int)  # 每个人已开始的jobs数量（不能动的）
+    failed_job_ids = []  # 获取标注失败的jobs，状态未知，不参与分配
+    
+    for task in tasks:
+        task_id = task['id']
+        task_name = task['name']
         
-        response = requests.get(url, headers=self.headers, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
+        jobs = task_jobs.get(task_id, [])
+        if not jobs:
+            continue
         
-        members = []
-        for member in data.get('results', []):
-            user = member.get('user', {})
-            role = member.get('role', 'worker')
-            
-            user_id = user.get('id')
-            username = user.get('username')
-            first_name = user.get('first_name', '')
-            last_name = user.get('last_name', '')
+        logger.info(f"   任务: {task_name} (ID: {task_id}) - {len(jobs)} jobs")
+        
+        for job in jobs:
+            summary = summaries.get(job['id'])
+            assignee = job.get('assignee')
+            assignee_id = assignee.get('id') if assignee else None
             
-            if first_name or last_name:
-                display_name = f"{first_name} {last_name}".strip()
+            if summary is None:
+                # 无法确定是否已开始，保守处理：不重新分配，仍算在原负责人名下
+                failed_job_ids.append(job['id'])
+                if assignee_id:
+                    user_started_jobs[assignee_id] += 1
+            elif summary['annotated_frames'] == 0:
+                # 未开始的job，可以重新分配
+                unstarted_jobs.append({
+                    'job_id': job['id'],
+                    'task_id': task_id,
+                    'task_name': task_name,
+                    'start_frame': job.get('start_frame', 0),
+                    'stop_frame': job.get('stop_frame', 0),
+                    'current_assignee': assignee.get('username') if assignee else None,
+                    'current_assignee_id': assignee_id
+                })
             else:
-                display_name = username
-            
-            members.append({
-                'id': user_id,
-                'name': display_name,
-                'username': username,
-                'role': role
-            })
-        
-        return members
-
+                # 已开始的job，统计到对应人员
+                if assignee_id:
+                    user_started_jobs[assignee_id] += 1
+    
+    return unstarted_jobs, user_started_jobs, failed_job_ids
 
 
 def reassign_jobs(config_file='config.json', task_ids=None):
@@ -156,79 +143,35 @@ def reassign_jobs(config_file='config.json', task_ids=None):
     api_key = config['cvat']['api_key']
     organization_slug = config.get('organization', {}).get('slug')
     
-    client = CVATClient(cvat_url, api_key)
-    
-    # 2. 实时获取组织所有成员（包括管理员）
-    logger.info("\n👥 获取组织成员...")
-    all_members = client.get_organization_members(organization_slug)
+    client = CVATClient(cvat_url, api_key, config.get('http'))
+    store = open_state_store(config)
+    try:
+        # 2. 同步组织成员、任务和jobs状态到本地状态库（所有任务的jobs进入同一个并发队列）
+        logger.info("\n🔍 同步成员、任务和Jobs状态...")
+        state = sync_state(client, store, organization_slug, task_ids, get_excluded_tasks(config),
+                           **get_sync_config(config))
+        if state is not None:
+            assign_unstarted_jobs(client, state)
+    finally:
+        store.close()
+        client.close()
+
+
+def assign_unstarted_jobs(client, state):
+    """按同步好的jobs状态，把未开始的jobs平均分配给选中的人员（交互确认后执行）"""
+    all_members = [member_info(m) for m in state['members']]
     if not all_members:
         logger.error("❌ 未找到组织成员")
         return
     logger.info(f"✅ 找到 {len(all_members)} 个成员")
     
-    # 3. 获取任务列表
-    logger.info("\n📋 获取任务列表...")
-    
-    if task_ids:
-        # 使用指定的任务ID
-        tasks = []
-        for task_id in task_ids:
-            url = f'{cvat_url}/api/tasks/{task_id}'
-            try:
-                response = requests.get(url, headers=client.headers, timeout=30)
-                response.raise_for_status()
-                tasks.append(response.json())
-            except Exception as e:
-                logger.error(f"❌ 获取任务失败: task_id={task_id}, {e}")
-    else:
-        tasks = client.get_all_tasks(organization_slug)
-    
-    tasks = [t for t in tasks if t['id'] not in EXCLUDED_TASKS]
-    logger.info(f"✅ 找到 {len(tasks)} 个任务")
+    logger.info(f"✅ 找到 {len(state['tasks'])} 个任务")
     
-    # 4. 扫描jobs，统计每个人的工作量
-    logger.info("\n🔍 扫描Jobs状态...")
-    unstarted_jobs = []
-    user_started_jobs = defaultdict(int)  # 每个人已开始的jobs数量（不能动的）
+    # 3. 按jobs状态统计每个人的工作量
+    unstarted_jobs, user_started_jobs, failed_job_ids = find_unstarted_jobs(state)
     
-    for task in tasks:
-        task_id = task['id']
-        task_name = task['name']
-        
-        jobs = client.get_task_jobs(task_id)
-        if not jobs:
-            continue
-        
-        logger.info(f"   任务: {task_name} (ID: {task_id}) - {len(jobs)} jobs")
-        
-        # 并发检查每个job
-        def check_job(job):
-            job_id = job['id']
-            annotated = client.get_job_annotations_count(job_id)
-            return job, annotated
-        
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(check_job, job) for job in jobs]
-            for future in as_completed(futures):
-                job, annotated = future.result()
-                assignee = job.get('assignee')
-                assignee_id = assignee.get('id') if assignee else None
-                
-                if annotated == 0:
-                    # 未开始的job，可以重新分配
-                    unstarted_jobs.append({
-                        'job_id': job['id'],
-                        'task_id': task_id,
-                        'task_name': task_name,
-                        'start_frame': job.get('start_frame', 0),
-                        'stop_frame': job.get('stop_frame', 0),
-                        'current_assignee': assignee.get('username') if assignee else None,
-                        'current_assignee_id': assignee_id
-                    })
-                else:
-                    # 已开始的job，统计到对应人员
-                    if assignee_id:
-                        user_started_jobs[assignee_id] += 1
+    if failed_job_ids:
+        logger.warning(f"\n⚠️  {len(failed_job_ids)} 个jobs获取标注失败（已重试），不参与分配: {failed_job_ids[:50]}")
     
     if not unstarted_jobs:
         logger.info("\n✅ 没有未开始的Jobs需要分配")
@@ -236,14 +179,14 @@ def reassign_jobs(config_file='config.json', task_ids=None):
     
     logger.info(f"\n📊 找到 {len(unstarted_jobs)} 个未开始的Jobs")
     
-    # 5. 显示未开始的jobs
+    # 4. 显示未开始的jobs
     logger.info("\n未开始的Jobs列表:")
     for idx, job in enumerate(unstarted_jobs):
         frame_count = job['stop_frame'] - job['start_frame'] + 1
         current = job['current_assignee'] or '未分配'
         logger.info(f"   {idx+1}. Job {job['job_id']} ({frame_count}帧) - 当前: {current}")
     
-    # 6. 显示所有成员，让用户选择参与分配的人
+    # 5. 显示所有成员，让用户选择参与分配的人
     print("\n" + "="*50)
     print("📋 组织成员列表（实时获取）:")
     print("="*50)
@@ -271,7 +214,7 @@ def reassign_jobs(config_file='config.json', task_ids=None):
     
     logger.info(f"\n✅ 参与分配的人员 ({len(selected_assignees)} 人): {[a['name'] for a in selected_assignees]}")
     
-    # 7. 计算平均分配方案
+    # 6. 计算平均分配方案
     # 统计选中人员当前已开始的jobs数量（annotated > 0 的，不能动）
     assignee_workload = {}
     for a in selected_assignees:
@@ -327,14 +270,14 @@ def reassign_jobs(config_file='config.json', task_ids=None):
         w = assignee_workload[a['id']]
         logger.info(f"   {w['name']}: 已开始 {w['started']} + 将分配 {w['need']} = {w['target']}")
     
-    # 8. 确认分配
+    # 7. 确认分配
     print(f"\n确认按上述方案分配？(y/n): ", end='')
     confirm = input().strip().lower()
     if confirm != 'y':
         logger.info("❌ 取消分配")
         return
     
-    # 9. 执行分配（按需分配给每个人）
+    # 8. 执行分配（按需分配给每个人）
     logger.info("\n🚀 开始分配...")
     success_count = 0
     fail_count = 0
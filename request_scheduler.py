@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+请求调度器 - 所有CVAT请求共享
+- 遇到 429 / 5xx 时按 Retry-After 等待，没有则指数退避 + 随机抖动后重试
+- AIMD 并发控制：被限流（429/503）时并发数减半，连续成功后逐步加 1，直到配置的上限
+  每个拥塞窗口最多减半一次：上次减半之前发出的请求再返回429不再减半；
+  单个请求的 500/502/504 只重试，不影响全局并发数
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# 需要退避重试的状态码（限流 / 网关临时错误）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 表示服务器过载、需要降低并发数的状态码
+CONGESTION_STATUS = {429, 503}
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（秒数或HTTP日期），返回秒数，无法解析返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RequestScheduler:
+    """共享的请求调度器（线程安全，线程池和异步引擎共用）"""
+
+    def __init__(self, max_concurrency, max_retries=5, backoff_base=1.0, backoff_max=60.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.limit = self.max_concurrency  # 当前允许的并发数
+        self.in_flight = 0
+        self.pause_until = 0.0             # 服务器要求暂停到的时间点（time.monotonic）
+        self.successes = 0                 # 上次调整后的连续成功数
+        self.window = 0                    # 拥塞窗口编号，每次减半加 1
+
+        # 统计
+        self.throttled = 0
+        self.retries = 0
+
+        self.cond = threading.Condition()
+        self.async_waiters = []            # 等待名额的协程 (事件循环, future)
+
+    # ---------- 并发闸门 ----------
+
+    def _wait_time(self):
+        """调用方需持有锁：返回还需要等待的秒数，0表示可以立即发出请求"""
+        pause = self.pause_until - time.monotonic()
+        if pause > 0:
+            return pause
+        if self.in_flight >= self.limit:
+            return None  # 等待其他请求完成
+        return 0
+
+    def _notify(self):
+        """调用方需持有锁：唤醒等待名额的线程和协程"""
+        self.cond.notify_all()
+        for loop, waiter in self.async_waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+        self.async_waiters.clear()
+
+    def acquire(self):
+        """获取一个请求名额（阻塞），返回发出请求时的拥塞窗口编号（传给 on_throttle）"""
+        with self.cond:
+            while True:
+                wait = self._wait_time()
+                if wait == 0:
+                    self.in_flight += 1
+                    return self.window
+                self.cond.wait(timeout=wait)
+
+    async def acquire_async(self):
+        """获取一个请求名额（异步等待，不阻塞事件循环），返回值同 acquire()
+
+        名额已满时等待 release / 并发数增加的通知；全局暂停时等到暂停结束。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.cond:
+                wait = self._wait_time()
+                if wait == 0:
+                    self.in_flight += 1
+                    return self.window
+                waiter = loop.create_future()
+                self.async_waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self._notify()
+
+    # ---------- 结果反馈 ----------
+
+    def should_retry(self, status):
+        return status in RETRY_STATUS
+
+    def on_success(self):
+        """加性增：每完成 limit 个成功请求，并发数 +1"""
+        with self.cond:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_concurrency:
+                self.limit += 1
+                self.successes = 0
+                self._notify()
+
+    def on_throttle(self, status, retry_after=None, window=None):
+        """乘性减：被限流（429/503）时并发数减半；有Retry-After时全局暂停（不超过 backoff_max）
+
+        window 为该请求发出时 acquire() 的返回值：上次减半之前发出的请求（同一批并发请求）
+        返回的429不再减半，每个拥塞窗口只减半一次。其他状态码（单个请求的500等）不调整并发数。
+        """
+        old_limit = None
+        with self.cond:
+            if retry_after:
+                self.pause_until = max(self.pause_until,
+                                      time.monotonic() + min(retry_after, self.backoff_max))
+            if status in CONGESTION_STATUS:
+                self.throttled += 1
+                if window is None or window == self.window:
+                    old_limit = self.limit
+                    self.limit = max(1, self.limit // 2)
+                    self.successes = 0
+                    self.window += 1
+        if old_limit is not None and self.limit != old_limit:
+            logger.warning(f"⚠️  服务器返回 {status}，并发数 {old_limit} → {self.limit}")
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """第attempt次重试前的等待时间：优先Retry-After，否则指数退避 + 全抖动"""
+        with self.cond:
+            self.retries += 1
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max) + random.uniform(0, self.backoff_base)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, delay)
+
+
+def _wake(waiter):
+    """在协程所在的事件循环中唤醒等待者（等待超时被取消的不再设置结果）"""
+    if not waiter.done():
+        waiter.set_result(None)
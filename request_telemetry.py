@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+请求统计 - 记录每个CVAT请求的接口、状态码、耗时、响应字节数和重试次数
+进程退出时把按接口汇总的统计（p50/p95/p99、总字节数、总请求数）写到 logs/request_stats_*.json
+"""
+import atexit
+import json
+import logging
+import re
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 路径中的数字ID统一替换为 {id}，如 /api/jobs/123/annotations → /api/jobs/{id}/annotations
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_template(method, url):
+    """请求 → 接口模板（去掉域名、查询参数和数字ID）"""
+    path = urlsplit(url).path.rstrip('/') or '/'
+    return f'{method.upper()} {_ID_SEGMENT.sub("/{id}", path)}'
+
+
+def percentile(sorted_values, pct):
+    """最近秩百分位数（sorted_values 需已排序）"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class RequestTelemetry:
+    """按接口汇总的请求统计（线程安全）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.bytes = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.started_at = datetime.now()
+        self.registered = False
+
+    def record(self, method, url, status, latency, nbytes=0, retries=0):
+        """记录一次请求（重试算同一次，status/latency为最后一次尝试）
+
+        status为None表示连接错误/超时。
+        """
+        endpoint = endpoint_template(method, url)
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.statuses[endpoint][str(status) if status is not None else 'error'] += 1
+            self.bytes[endpoint] += nbytes or 0
+            self.retries[endpoint] += retries
+            if not self.registered:
+                self.registered = True
+                atexit.register(self.write_summary)
+
+    def reset(self):
+        """清空统计并重新计时（watch 模式定期写出统计后调用，长时间运行内存不增长）"""
+        with self.lock:
+            self.latencies.clear()
+            self.statuses.clear()
+            self.bytes.clear()
+            self.retries.clear()
+            self.started_at = datetime.now()
+
+    def summary(self):
+        with self.lock:
+            endpoints = {}
+            for endpoint, latencies in sorted(self.latencies.items()):
+                values = sorted(latencies)
+                endpoints[endpoint] = {
+                    'requests': len(values),
+                    'statuses': dict(self.statuses[endpoint]),
+                    'retries': self.retries[endpoint],
+                    'bytes': self.bytes[endpoint],
+                    'p50_ms': round(percentile(values, 50) * 1000, 1),
+                    'p95_ms': round(percentile(values, 95) * 1000, 1),
+                    'p99_ms': round(percentile(values, 99) * 1000, 1),
+                    'total_s': round(sum(values), 2),
+                }
+
+        return {
+            'script': Path(sys.argv[0]).stem,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'total_requests': sum(e['requests'] for e in endpoints.values()),
+            'total_bytes': sum(e['bytes'] for e in endpoints.values()),
+            'total_retries': sum(e['retries'] for e in endpoints.values()),
+            'endpoints': endpoints,
+        }
+
+    def write_summary(self, log_dir='logs'):
+        """写出本次运行的请求统计，并在日志中输出按接口的摘要"""
+        summary = self.summary()
+        if not summary['total_requests']:
+            return None
+
+        log_dir = Path(log_dir)
+        log_dir.mkdir(exist_ok=True)
+        stats_file = log_dir / f'request_stats_{summary["script"]}_{self.started_at.strftime("%Y%m%d_%H%M%S")}.json'
+        with open(stats_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        logger.info(f"\n📡 请求统计: {summary['total_requests']} 个请求, "
+                    f"{summary['total_bytes'] / 1024 / 1024:.1f} MB, 重试 {summary['total_retries']} 次")
+        for endpoint, stats in summary['endpoints'].items():
+            logger.info(f"   {endpoint}: {stats['requests']}次 | p50 {stats['p50_ms']}ms | "
+                        f"p95 {stats['p95_ms']}ms | p99 {stats['p99_ms']}ms | {stats['bytes'] / 1024:.0f} KB")
+        logger.info(f"   统计已保存: {stats_file}")
+        return stats_file
+
+
+# 进程内所有客户端共用一份统计
+telemetry = RequestTelemetry()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+一次扫描，生成全部报告 - 每天早上的例行检查
+同步一次（或直接读本地状态库），用同一份数据依次生成：
+- 标注状态报告 annotation_status_*.json 和新数据列表 new_images_*.txt（check_annotation_status）
+- 人员进度报告 progress_report_*.json / daily_report_*.txt（check_progress）
+- 每日绩效报告和CSV（check_daily_performance）
+- 待分配的未开始jobs列表 reassign_candidates_*.json（只列出，不执行分配，分配用 reassign_jobs.py）
+
+用法:
+    python run_reports.py                   # 同步后生成全部报告
+    python run_reports.py 123 456           # 只处理指定任务
+    python run_reports.py --offline         # 不同步，不访问网络，只用本地状态库（含帧索引和云存储清单）
+"""
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+
+# 先配置日志：各检查脚本导入时的 basicConfig 不再生效，全部输出到本脚本的日志文件
+log_dir = Path('logs')
+log_dir.mkdir(exist_ok=True)
+log_file = log_dir / f'run_reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+from cvat_client import BaseCVATClient
+from state_store import get_excluded_tasks, get_sync_config, load_state, open_state_store, sync_state
+from check_annotation_status import check_annotation_status
+from check_daily_performance import check_daily_performance
+from check_progress import check_progress
+from reassign_jobs import find_unstarted_jobs, member_info
+
+
+def save_reassign_candidates(state):
+    """保存未开始、可重新分配的jobs和每个人已开始的jobs数"""
+    unstarted_jobs, user_started_jobs, failed_job_ids = find_unstarted_jobs(state)
+    members = [member_info(m) for m in state['members']]
+
+    result = {
+        'generated_at': datetime.now().isoformat(),
+        'synced_at': state['synced_at'],
+        'unstarted_jobs': unstarted_jobs,
+        'started_jobs_by_member': [
+            {**m, 'started_jobs': user_started_jobs.get(m['id'], 0)} for m in members
+        ],
+        'failed_jobs': failed_job_ids,
+    }
+
+    result_file = log_dir / f'reassign_candidates_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    logger.info(f"\n📊 未开始的Jobs: {len(unstarted_jobs)} 个"
+                f"（{sum(j['stop_frame'] - j['start_frame'] + 1 for j in unstarted_jobs)} 帧）")
+    if failed_job_ids:
+        logger.warning(f"⚠️  {len(failed_job_ids)} 个jobs获取标注失败，不参与分配")
+    logger.info(f"✅ 待分配列表已保存: {result_file}")
+    logger.info(f"💡 执行分配: python reassign_jobs.py")
+    return result_file
+
+
+def run_reports(config_file='config.json', task_ids=None, offline=False):
+    """同步一次，生成全部报告"""
+    logger.info("="*60)
+    logger.info("一次扫描，生成全部报告")
+    logger.info("="*60)
+
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"❌ 配置文件不存在: {config_file}")
+        return False
+
+    store = open_state_store(config)
+    started = time.monotonic()
+
+    if offline:
+        logger.info(f"\n💾 从本地状态库读取（不访问网络）: {store.path}")
+        state = load_state(store, task_ids, get_excluded_tasks(config))
+        store.close()
+        if not state['synced_at']:
+            logger.error("❌ 本地状态库为空，请先运行: python sync.py")
+            return False
+    else:
+        logger.info(f"\n🔄 同步任务、jobs和标注统计...")
+        client = BaseCVATClient(config['cvat']['url'], config['cvat']['api_key'], config.get('http'))
+        organization_slug = config.get('organization', {}).get('slug')
+
+        def on_progress(completed, total):
+            if completed % 100 == 0:
+                logger.info(f"      进度: {completed}/{total} jobs")
+
+        try:
+            state = sync_state(client, store, organization_slug, task_ids, get_excluded_tasks(config),
+                               on_progress, **get_sync_config(config))
+        finally:
+            store.close()
+            client.close()
+        if state is None:
+            return False
+    logger.info(f"✅ 数据就绪: {len(state['tasks'])} 个任务, {len(state['summaries'])} 个jobs, "
+                f"同步于 {state['synced_at']}（{time.monotonic() - started:.1f}秒）")
+
+    # 标注状态报告的帧文件名和云存储清单：在线时补齐并更新，--offline 只用本地状态库中已保存的
+    check_annotation_status(config_file, task_ids, offline=offline, state=state)
+    check_progress(config_file, task_ids, state=state)
+    check_daily_performance(config_file, task_ids, state=state)
+    save_reassign_candidates(state)
+
+    logger.info("\n" + "="*60)
+    logger.info(f"✅ 全部报告已生成，总耗时 {time.monotonic() - started:.1f}秒")
+    logger.info(f"📝 日志文件: {log_file}")
+    logger.info("="*60)
+    return True
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    offline = '--offline' in args
+    args = [arg for arg in args if arg != '--offline']
+
+    task_ids = None
+    if args:
+        try:
+            task_ids = [int(tid) for tid in args]
+            logger.info(f"处理指定任务: {task_ids}")
+        except ValueError:
+            logger.error("❌ 任务ID必须是数字")
+            logger.info("用法: python run_reports.py [--offline] [task_id1] [task_id2] ...")
+            return
+
+    run_reports(task_ids=task_ids, offline=offline)
+
+
+if __name__ == "__main__":
+    main()
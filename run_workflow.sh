@@ -91,9 +91,13 @@ show_menu() {
     echo "  7. 刷新标注人员列表"
     echo "  8. 动态分配未开始的Jobs"
     echo ""
+    echo "【每日例行】"
+    echo "  9. 一次扫描生成全部报告（状态/进度/绩效/待分配）"
+    echo "  10. 持续监控（每5分钟增量同步并刷新进度和绩效报告，Ctrl+C 停止）"
+    echo ""
     echo "  0. 退出"
     echo ""
-    echo -n "请选择操作 [0-8]: "
+    echo -n "请选择操作 [0-10]: "
 }
 
 # 1. 从旧平台迁移
@@ -305,6 +309,50 @@ reassign_jobs() {
     fi
 }
 
+# 9. 一次扫描生成全部报告
+run_reports() {
+    print_info "一次扫描，生成全部报告（代替依次运行选项 2、4、5、8）..."
+    echo ""
+    
+    $PYTHON run_reports.py
+    
+    if [ $? -eq 0 ]; then
+        print_success "全部报告已生成"
+        
+        latest_new_images=$(ls -t logs/new_images_*.txt 2>/dev/null | head -1)
+        if [ -n "$latest_new_images" ]; then
+            print_info "新数据列表: $latest_new_images"
+        fi
+        latest_csv=$(ls -t reports/daily_performance_*.csv 2>/dev/null | head -1)
+        if [ -n "$latest_csv" ]; then
+            print_info "CSV报告: $latest_csv"
+        fi
+        latest_candidates=$(ls -t logs/reassign_candidates_*.json 2>/dev/null | head -1)
+        if [ -n "$latest_candidates" ]; then
+            print_info "待分配Jobs: $latest_candidates"
+        fi
+        
+        # 显示最新的每日报告
+        latest_daily=$(ls -t logs/daily_report_*.txt 2>/dev/null | head -1)
+        if [ -n "$latest_daily" ]; then
+            echo ""
+            cat "$latest_daily"
+        fi
+    else
+        print_error "生成报告失败，请查看日志"
+    fi
+}
+
+watch_progress() {
+    print_info "持续监控：每轮增量同步后刷新 logs/daily_report_*.txt 和 reports/daily_performance_*.csv"
+    print_info "按 Ctrl+C 停止"
+    echo ""
+    
+    $PYTHON watch.py
+    
+    print_success "持续监控已停止"
+}
+
 # 6. 查看最新报告
 view_reports() {
     echo ""
@@ -329,7 +377,8 @@ view_reports() {
             fi
             print_info "最新状态报告: $latest_report"
             echo ""
-            $PYTHON -m json.tool "$latest_report"
+            # 只读汇总文件；图片列表在压缩明细文件中（zcat 查看）
+            $PYTHON -c "import json; data=json.load(open('$latest_report')); print(json.dumps(data.get('summary',{}), indent=2, ensure_ascii=False)); print(f\"📦 {len(data.get('chunks',{}))} 个chunk，图片明细: logs/{data.get('details','')}\")"
             ;;
         2)
             latest_daily=$(ls -t logs/daily_report_*.txt 2>/dev/null | head -1)
@@ -405,6 +454,12 @@ main() {
             8)
                 reassign_jobs
                 ;;
+            9)
+                run_reports
+                ;;
+            10)
+                watch_progress
+                ;;
             0)
                 print_info "退出"
                 exit 0
@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+"""
+本地状态库（SQLite）- 各报告脚本共用的任务/jobs/成员/标注统计/云存储文件
+- sync.py 从CVAT同步一次，写入本地库
+- check_progress / check_daily_performance / check_annotation_status 加 --offline 时直接查询本地库，不访问网络
+- 标注统计表与标注缓存是同一张表（job_summaries），同步时updated_date未变的job不重新下载
+- 增量同步：记录水位线（已同步对象的最大updated_date），之后只获取此后修改过的任务和jobs
+- 云存储清单：按session记录文件key、ETag、LastModified和是否完整，之后只重新列举未完整的session和新分片
+- 冻结层：jobs全部完成或长时间未修改的任务，完整同步时照常列出jobs，但不再下载标注，沿用库中的标注统计，
+  只按 frozen_recheck_hours 重新下载
+- 任务帧索引：第 i 帧对应的文件名，导入脚本创建任务时写入，其余任务第一次从 data/meta 获取后写入（任务数据创建后不变）
+"""
+import json
+import logging
+import sqlite3
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from annotation_cache import DEFAULT_CACHE_PATH, AnnotationCache
+from cvat_client import loads_json
+from job_scanner import scan_job_annotations, scan_tasks
+
+logger = logging.getLogger(__name__)
+
+# 增量同步从水位线往前多取一段，覆盖列表请求期间提交的修改
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# 增量同步发现不了已删除的任务/jobs，距上次完整同步超过此时长时自动做一次完整同步
+DEFAULT_FULL_SYNC_HOURS = 24
+
+# 排除的任务（旧平台），config.json 的 sync.excluded_tasks 可覆盖
+DEFAULT_EXCLUDED_TASKS = (1967925,)
+
+# 冻结层：jobs全部完成，或超过此天数未修改的任务不再重新下载标注
+DEFAULT_FREEZE_AFTER_DAYS = 30
+
+# 冻结的任务每隔此时长重新下载一次标注（python sync.py --full 可随时强制）
+DEFAULT_FROZEN_RECHECK_HOURS = 24 * 7
+
+# 任务帧索引的编码版本，格式变化时加1，其他版本的记录视为不存在（重新获取）
+FRAME_INDEX_VERSION = 1
+
+
+def get_sync_config(config):
+    """读取config.json中的sync配置，返回 sync_state() 的关键字参数
+
+    配置示例:
+        "sync": {
+            "incremental": true,        # 有水位线时只同步修改过的任务和jobs
+            "full_every_hours": 24,     # 距上次完整同步超过此时长时做一次完整同步
+            "freeze_after_days": 30,    # jobs全部完成或超过此天数未修改的任务冻结，完整同步时不重新下载标注（0 表示不冻结）
+            "frozen_recheck_hours": 168,# 冻结的任务每隔此时长重新下载一次标注
+            "excluded_tasks": [1967925] # 排除的任务（见 get_excluded_tasks）
+        }
+    """
+    sync_config = (config or {}).get('sync', {}) or {}
+    cache_config = (config or {}).get('cache', {}) or {}
+    return {
+        'refresh': not cache_config.get('enabled', True),
+        'incremental': bool(sync_config.get('incremental', True)),
+        'full_every_hours': float(sync_config.get('full_every_hours', DEFAULT_FULL_SYNC_HOURS)),
+        'freeze_after_days': float(sync_config.get('freeze_after_days', DEFAULT_FREEZE_AFTER_DAYS)),
+        'frozen_recheck_hours': float(sync_config.get('frozen_recheck_hours', DEFAULT_FROZEN_RECHECK_HOURS)),
+    }
+
+
+def get_excluded_tasks(config):
+    """读取排除的任务ID（config.json 的 sync.excluded_tasks，默认为旧平台任务）"""
+    sync_config = (config or {}).get('sync', {}) or {}
+    return {int(task_id) for task_id in sync_config.get('excluded_tasks', DEFAULT_EXCLUDED_TASKS)}
+
+
+def open_state_store(config):
+    """打开本地状态库（与标注缓存共用 cache.path，cache.enabled 为false时同步会重新下载所有标注）"""
+    cache_config = (config or {}).get('cache', {}) or {}
+    return StateStore(cache_config.get('path') or DEFAULT_CACHE_PATH)
+
+
+def save_imported_frames(config, task_id, frames):
+    """导入脚本创建任务后保存帧索引（frames 按帧顺序），核对状态时不再请求该任务的 data/meta"""
+    try:
+        store = open_state_store(config)
+        try:
+            store.put_task_frames(task_id, frames, 'import')
+        finally:
+            store.close()
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️  保存任务 {task_id} 的帧索引失败: {e}，核对状态时将从CVAT获取")
+        return False
+    logger.info(f"📇 帧索引已保存: 任务 {task_id}, {len(frames)} 帧")
+    return True
+
+
+def _assignee_id(job):
+    assignee = job.get('assignee')
+    return assignee.get('id') if assignee else None
+
+
+def _prefix_range(prefix):
+    """以prefix开头的字符串的范围 [low, high)，用主键索引做前缀查询（U+10FFFF 是最大的字符）"""
+    return prefix, prefix + '\U0010ffff'
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def encode_frame_index(frames):
+    """帧文件名列表 → 压缩后的帧索引（同一任务的路径前缀大量重复，zlib压缩后很小）"""
+    return zlib.compress('\n'.join(frames).encode('utf-8'))
+
+
+def decode_frame_index(blob):
+    """压缩后的帧索引 → 帧文件名列表"""
+    text = zlib.decompress(blob).decode('utf-8')
+    return text.split('\n') if text else []
+
+
+def _latest_updated_date(objects, default=None):
+    """对象中最大的updated_date（保留服务器返回的原始字符串，按时间而不是字符串比较）"""
+    latest, latest_dt = default, _parse_date(default)
+    for obj in objects:
+        dt = _parse_date(obj.get('updated_date'))
+        if dt is not None and (latest_dt is None or dt > latest_dt):
+            latest, latest_dt = obj['updated_date'], dt
+    return latest
+
+
+class StateStore(AnnotationCache):
+    """本地状态库：在标注缓存的基础上增加 tasks / jobs / memberships / cloud_sessions / cloud_objects / task_frames / meta 表
+
+    对象以CVAT返回的原始JSON保存在data列，常用的查询字段单独成列并建索引。
+    seq 记录列表接口返回的顺序，查询时按原顺序输出，报告与在线扫描一致。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        super().__init__(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                updated_date TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                task_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                assignee_id INTEGER,
+                start_frame INTEGER NOT NULL,
+                updated_date TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_task_id ON jobs (task_id, seq);
+            CREATE INDEX IF NOT EXISTS jobs_assignee_id ON jobs (assignee_id);
+            CREATE TABLE IF NOT EXISTS memberships (
+                user_id INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cloud_sessions (
+                bucket TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                shard TEXT NOT NULL,
+                complete INTEGER NOT NULL,
+                objects INTEGER NOT NULL,
+                listed_at TEXT NOT NULL,
+                PRIMARY KEY (bucket, prefix)
+            );
+            CREATE TABLE IF NOT EXISTS cloud_objects (
+                bucket TEXT NOT NULL,
+                key TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                PRIMARY KEY (bucket, key)
+            );
+            CREATE TABLE IF NOT EXISTS task_frames (
+                task_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                frames BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        self.conn.commit()
+
+    # ---------- 写入 ----------
+
+    def replace_tasks(self, tasks, full=False):
+        """写入任务；full=True 表示这是完整列表，库中不在列表里的任务及其jobs一并删除"""
+        with self.lock:
+            if full:
+                self.conn.execute('DELETE FROM tasks')
+                self.conn.executemany(
+                    'INSERT INTO tasks (id, seq, updated_date, data) VALUES (?, ?, ?, ?)',
+                    [(t['id'], seq, t.get('updated_date'), json.dumps(t)) for seq, t in enumerate(tasks)]
+                )
+                self.conn.execute('DELETE FROM jobs WHERE task_id NOT IN (SELECT id FROM tasks)')
+                self.conn.execute('DELETE FROM job_summaries WHERE job_id NOT IN (SELECT id FROM jobs)')
+                self.conn.execute('DELETE FROM task_frames WHERE task_id NOT IN (SELECT id FROM tasks)')
+            else:
+                # 部分同步：已有任务保持原来的顺序，新任务排在最后
+                self.conn.executemany(
+                    'INSERT INTO tasks (id, seq, updated_date, data) '
+                    'VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM tasks), ?, ?) '
+                    'ON CONFLICT(id) DO UPDATE SET updated_date = excluded.updated_date, data = excluded.data',
+                    [(t['id'], t.get('updated_date'), json.dumps(t)) for t in tasks]
+                )
+            self.conn.commit()
+
+    def replace_task_jobs(self, task_jobs):
+        """按任务整体替换jobs {task_id: [job, ...]}"""
+        with self.lock:
+            for task_id, jobs in task_jobs.items():
+                self.conn.execute('DELETE FROM jobs WHERE task_id = ?', (task_id,))
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO jobs (id, task_id, seq, assignee_id, start_frame, updated_date, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(job['id'], task_id, seq, _assignee_id(job), job.get('start_frame', 0),
+                      job.get('updated_date'), json.dumps(job)) for seq, job in enumerate(jobs)]
+                )
+            self.conn.commit()
+
+    def upsert_jobs(self, jobs):
+        """增量写入jobs：已有的job保持原来的顺序，新job排在所属任务的最后"""
+        with self.lock:
+            self.conn.executemany(
+                'INSERT INTO jobs (id, task_id, seq, assignee_id, start_frame, updated_date, data) '
+                'VALUES (?, ?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM jobs WHERE task_id = ?), ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET task_id = excluded.task_id, assignee_id = excluded.assignee_id, '
+                'start_frame = excluded.start_frame, updated_date = excluded.updated_date, data = excluded.data',
+                [(job['id'], job['task_id'], job['task_id'], _assignee_id(job), job.get('start_frame', 0),
+                  job.get('updated_date'), json.dumps(job)) for job in jobs]
+            )
+            self.conn.commit()
+
+    def replace_memberships(self, members):
+        with self.lock:
+            self.conn.execute('DELETE FROM memberships')
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO memberships (user_id, seq, data) VALUES (?, ?, ?)',
+                [(m['user']['id'], seq, json.dumps(m)) for seq, m in enumerate(members) if m.get('user')]
+            )
+            self.conn.commit()
+
+    def replace_cloud_prefixes(self, bucket, prefixes, sessions, listed_at):
+        """用重新列举的结果整体替换云存储清单中这些前缀下的内容
+
+        sessions 可以是边列举边产出的生成器，每个session到达即写入，全部写完后一次提交。
+
+        Args:
+            bucket: 存储桶
+            prefixes: 重新列举过的前缀（分片或session），库中这些前缀下原有的session和文件全部删除
+            sessions: 可迭代的 (session前缀, {'shard', 'complete', 'objects': [(key, etag, last_modified), ...]})
+            listed_at: 列举时间
+
+        Returns:
+            写入的文件数
+        """
+        with self.lock:
+            for prefix in prefixes:
+                low, high = _prefix_range(prefix)
+                self.conn.execute('DELETE FROM cloud_sessions WHERE bucket = ? AND prefix >= ? AND prefix < ?',
+                                  (bucket, low, high))
+                self.conn.execute('DELETE FROM cloud_objects WHERE bucket = ? AND key >= ? AND key < ?',
+                                  (bucket, low, high))
+
+        written = 0
+        try:
+            for prefix, session in sessions:
+                with self.lock:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO cloud_sessions (bucket, prefix, shard, complete, objects, listed_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (bucket, prefix, session['shard'], int(session['complete']), len(session['objects']),
+                         listed_at)
+                    )
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO cloud_objects (bucket, key, etag, last_modified) VALUES (?, ?, ?, ?)',
+                        [(bucket, *obj) for obj in session['objects']]
+                    )
+                written += len(session['objects'])
+        except BaseException:
+            # 列举中途失败：放弃本次的删除和写入，清单保持上次的状态
+            with self.lock:
+                self.conn.rollback()
+            raise
+
+        with self.lock:
+            self.conn.commit()
+        return written
+
+    def put_task_frames(self, task_id, frames, source):
+        """保存任务的帧索引（第 i 项为第 i 帧的文件名）；source: import（导入时写入）/ meta（来自 data/meta）"""
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO task_frames (task_id, version, source, frames) VALUES (?, ?, ?, ?)',
+                (task_id, FRAME_INDEX_VERSION, source, encode_frame_index(frames))
+            )
+            self.conn.commit()
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+            self.conn.commit()
+
+    # ---------- 查询 ----------
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def query_tasks(self, task_ids=None):
+        """任务列表；指定task_ids时按给定顺序返回库中存在的任务"""
+        with self.lock:
+            rows = self.conn.execute('SELECT id, data FROM tasks ORDER BY seq').fetchall()
+        if task_ids is None:
+            return [loads_json(data) for _, data in rows]
+        by_id = dict(rows)
+        return [loads_json(by_id[task_id]) for task_id in task_ids if task_id in by_id]
+
+    def query_task_jobs(self, task_ids):
+        """{task_id: [job, ...]} 及对应的标注统计 {job_id: summary或None}
+
+        标注统计只在 updated_date 和 start_frame 都与job一致时有效，
+        否则（同步时获取失败、job已被修改）为None，报告按失败处理。
+        """
+        task_jobs = {task_id: [] for task_id in task_ids}
+        summaries = {}
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT j.task_id, j.id, j.data, s.shapes, s.tracks, s.annotated_frames, s.frame_bitmap '
+                'FROM jobs j LEFT JOIN job_summaries s '
+                'ON s.job_id = j.id AND s.updated_date = j.updated_date AND s.start_frame = j.start_frame '
+                'ORDER BY j.task_id, j.seq'
+            ).fetchall()
+
+        for task_id, job_id, data, shapes, tracks, annotated_frames, bitmap in rows:
+            jobs = task_jobs.get(task_id)
+            if jobs is None:
+                continue
+            jobs.append(loads_json(data))
+            if shapes is None:
+                summaries[job_id] = None
+            else:
+                summaries[job_id] = {
+                    'shapes': shapes,
+                    'tracks': tracks,
+                    'annotated_frames': annotated_frames,
+                    'frame_bitmap': int.from_bytes(bitmap, 'little'),
+                }
+        return task_jobs, summaries
+
+    def query_task_frames(self, task_ids):
+        """{task_id: 帧文件名列表}，没有记录或版本不符的任务不在结果中"""
+        task_ids = set(task_ids)
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT task_id, frames FROM task_frames WHERE version = ?', (FRAME_INDEX_VERSION,)
+            ).fetchall()
+        return {task_id: decode_frame_index(blob) for task_id, blob in rows if task_id in task_ids}
+
+    def query_task_updated_dates(self):
+        """{task_id: 上次同步时任务的updated_date}"""
+        with self.lock:
+            rows = self.conn.execute('SELECT id, updated_date FROM tasks').fetchall()
+        return dict(rows)
+
+    def query_task_ids(self):
+        with self.lock:
+            return {task_id for task_id, in self.conn.execute('SELECT id FROM tasks')}
+
+    def query_jobs_without_summary(self):
+        """没有有效标注统计的jobs（上次获取失败），增量同步时重试"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT j.data FROM jobs j LEFT JOIN job_summaries s '
+                'ON s.job_id = j.id AND s.updated_date = j.updated_date AND s.start_frame = j.start_frame '
+                'WHERE s.job_id IS NULL'
+            ).fetchall()
+        return [loads_json(data) for data, in rows]
+
+    def query_memberships(self):
+        with self.lock:
+            rows = self.conn.execute('SELECT data FROM memberships ORDER BY seq').fetchall()
+        return [loads_json(data) for data, in rows]
+
+    def query_cloud_sessions(self, bucket, prefix=''):
+        """云存储清单中的session {session前缀: (分片前缀, 是否完整)}"""
+        low, high = _prefix_range(prefix)
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT prefix, shard, complete FROM cloud_sessions WHERE bucket = ? AND prefix >= ? AND prefix < ?',
+                (bucket, low, high)
+            ).fetchall()
+        return {session: (shard, bool(complete)) for session, shard, complete in rows}
+
+    def iter_cloud_files(self, bucket, prefix='', batch_size=10000):
+        """按key顺序分批读取云存储清单中的文件key，不一次性载入内存"""
+        low, high = _prefix_range(prefix)
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    'SELECT key FROM cloud_objects WHERE bucket = ? AND key >= ? AND key < ? ORDER BY key LIMIT ?',
+                    (bucket, low, high, batch_size)
+                ).fetchall()
+            yield from (key for key, in rows)
+            if len(rows) < batch_size:
+                return
+            low = rows[-1][0] + '\x00'
+
+    def query_cloud_files(self, bucket, prefix=''):
+        """云存储清单中的文件key（按key排序）"""
+        low, high = _prefix_range(prefix)
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT key FROM cloud_objects WHERE bucket = ? AND key >= ? AND key < ? ORDER BY key',
+                (bucket, low, high)
+            ).fetchall()
+        return [key for key, in rows]
+
+
+def load_state(store, task_ids=None, excluded=()):
+    """从本地库读出报告所需的数据
+
+    Returns:
+        {'tasks', 'task_jobs', 'summaries', 'members', 'synced_at'}，结构与在线扫描的结果相同
+    """
+    tasks = [t for t in store.query_tasks(task_ids) if t['id'] not in excluded]
+    task_jobs, summaries = store.query_task_jobs([t['id'] for t in tasks])
+    return {
+        'tasks': tasks,
+        'task_jobs': task_jobs,
+        'summaries': summaries,
+        'members': store.query_memberships(),
+        'synced_at': store.get_meta('synced_at'),
+    }
+
+
+def _sync_memberships(client, store, organization_slug):
+    try:
+        store.replace_memberships(list(client.iter_memberships(organization_slug)))
+    except requests.exceptions.RequestException as e:
+        logger.error(f"❌ 获取组织成员失败: {e}，沿用本地库中的成员")
+
+
+def _full_sync_due(store, full_every_hours, key='full_synced_at'):
+    last_full = store.get_meta(key)
+    if not last_full:
+        return True
+    return datetime.now() - datetime.fromisoformat(last_full) >= timedelta(hours=full_every_hours)
+
+
+def _frozen_summaries(store, tasks, freeze_after_days):
+    """冻结层：任务的updated_date与库中一致，库中jobs的标注统计都有效，
+    且jobs全部完成或超过 freeze_after_days 天未修改
+
+    只冻结标注：jobs仍从CVAT列出（分配人、状态等修改不改变任务的updated_date），
+    冻结任务的job即使updated_date变了也沿用库中的标注统计，不重新下载。
+
+    Returns:
+        (冻结的任务数, {job_id: (库中的job, 标注统计)})
+    """
+    stored = store.query_task_updated_dates()
+    candidates = [t['id'] for t in tasks if t['id'] in stored and stored[t['id']] == t.get('updated_date')]
+    if not candidates:
+        return 0, {}
+
+    task_jobs, summaries = store.query_task_jobs(candidates)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=freeze_after_days)
+    updated_dates = {t['id']: _parse_date(t.get('updated_date')) for t in tasks}
+    frozen_tasks = 0
+    frozen = {}
+    for task_id in candidates:
+        jobs = task_jobs.get(task_id)
+        if not jobs or any(summaries.get(job['id']) is None for job in jobs):
+            continue
+        updated = updated_dates[task_id]
+        idle = updated is not None and updated.replace(tzinfo=updated.tzinfo or timezone.utc) < cutoff
+        if idle or all(job.get('state') == 'completed' for job in jobs):
+            frozen_tasks += 1
+            frozen.update((job['id'], (job, summaries[job['id']])) for job in jobs)
+    return frozen_tasks, frozen
+
+
+def sync_state(client, store, organization_slug=None, task_ids=None, excluded=(),
+               on_progress=None, refresh=False, incremental=True,
+               full_every_hours=DEFAULT_FULL_SYNC_HOURS, full=False,
+               freeze_after_days=DEFAULT_FREEZE_AFTER_DAYS, frozen_recheck_hours=DEFAULT_FROZEN_RECHECK_HOURS):
+    """从CVAT同步任务、jobs、成员和标注统计到本地库，返回 load_state() 的结果
+
+    同步整个组织且已有水位线时默认增量同步（只获取修改过的任务和jobs），
+    没有水位线、距上次完整同步超过full_every_hours或full=True时完整同步。
+    同步整个组织时冻结任务（见 _frozen_summaries）的jobs照常列出，但不重新下载标注；距上次下载全部任务超过
+    frozen_recheck_hours、full=True 或 refresh=True 时不冻结；指定task_ids时这些任务也不冻结。
+
+    Args:
+        client: BaseCVATClient 实例
+        store: StateStore
+        organization_slug: 组织slug
+        task_ids: 只同步这些任务；不指定时同步组织内全部任务（完整同步时库中已删除的任务一并清理）
+        excluded: 排除的任务ID
+        on_progress: 可选回调 on_progress(completed, total)
+        refresh: 为True时忽略已有的标注统计，全部重新下载
+        incremental: 是否允许增量同步
+        full_every_hours: 两次完整同步的最长间隔（小时）
+        full: 强制完整同步（冻结任务的标注也重新下载）
+        freeze_after_days: 超过此天数未修改的任务冻结，0 表示不冻结
+        frozen_recheck_hours: 冻结任务重新下载标注的间隔（小时）
+
+    Returns:
+        load_state() 的结果；任务列表获取失败时返回None
+    """
+    watermark = store.get_meta('watermark')
+    if (incremental and not full and not task_ids and organization_slug and watermark
+            and not _full_sync_due(store, full_every_hours)):
+        return _sync_delta(client, store, organization_slug, watermark, excluded, on_progress, refresh)
+
+    if task_ids:
+        tasks = []
+        for task_id in task_ids:
+            try:
+                tasks.append(client.get_task(task_id))
+            except Exception as e:
+                logger.error(f"❌ 获取任务失败: task_id={task_id}, {e}")
+    else:
+        try:
+            tasks = list(client.iter_tasks(organization_slug))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"❌ 获取任务列表失败: {e}")
+            return None
+    tasks = [t for t in tasks if t['id'] not in excluded]
+    logger.info(f"✅ 获取任务列表成功: {len(tasks)} 个任务")
+
+    if organization_slug:
+        _sync_memberships(client, store, organization_slug)
+
+    frozen_tasks, frozen = 0, {}
+    if freeze_after_days and not (task_ids or full or refresh
+                                  or _full_sync_due(store, frozen_recheck_hours, 'frozen_checked_at')):
+        frozen_tasks, frozen = _frozen_summaries(store, tasks, freeze_after_days)
+        if frozen_tasks:
+            logger.info(f"🧊 冻结任务 {frozen_tasks} 个：jobs照常列出，标注统计沿用本地库，不重新下载")
+
+    # 冻结任务中只改了分配人/状态的job（updated_date变了，start_frame没变）沿用库中的标注统计，
+    # 以新的updated_date写回，之后的查询和缓存都按新job匹配
+    carried = []
+
+    def resolve(job):
+        entry = frozen.get(job['id'])
+        if entry is None or entry[0].get('start_frame', 0) != job.get('start_frame', 0):
+            return None
+        stored_job, summary = entry
+        if stored_job.get('updated_date') != job.get('updated_date'):
+            carried.append((job, summary))
+        return summary
+
+    task_jobs, summaries = scan_tasks(client, tasks, on_progress, organization_slug,
+                                      cache=None if refresh else store, resolve=resolve if frozen else None)
+    if refresh:
+        store.put_many(
+            (job, summaries.get(job['id'])) for jobs in task_jobs.values() for job in jobs
+        )
+    store.put_many(carried)
+
+    # jobs列表获取失败的任务不在task_jobs中，保留库中上次同步的jobs
+    stale = [t['id'] for t in tasks if t['id'] not in task_jobs]
+    if stale:
+        logger.warning(f"⚠️  {len(stale)} 个任务的jobs列表获取失败，沿用上次同步的数据: {stale[:20]}")
+
+    # 先写jobs再写任务：完整同步清理已删除jobs的标注统计时，新jobs必须已在库中
+    store.replace_task_jobs(task_jobs)
+    store.replace_tasks(tasks, full=not task_ids)
+    now = datetime.now().isoformat(timespec='seconds')
+    store.set_meta('synced_at', now)
+
+    # 只有完整且成功的组织同步才能作为增量同步的起点
+    if not task_ids and not stale:
+        all_jobs = (job for jobs in task_jobs.values() for job in jobs)
+        store.set_meta('watermark', _latest_updated_date(all_jobs, _latest_updated_date(tasks)))
+        store.set_meta('full_synced_at', now)
+        if not frozen:
+            store.set_meta('frozen_checked_at', now)
+
+    return load_state(store, [t['id'] for t in tasks])
+
+
+def _sync_delta(client, store, organization_slug, watermark, excluded, on_progress, refresh):
+    """增量同步：只获取水位线之后修改过的任务和jobs，只为这些jobs（及上次获取失败的jobs）下载标注"""
+    since = _parse_date(watermark) - WATERMARK_OVERLAP
+    since = since.isoformat().replace('+00:00', 'Z')
+    logger.info(f"🔄 增量同步: 获取 {since} 之后修改过的任务和jobs")
+
+    try:
+        tasks = [t for t in client.iter_tasks(organization_slug, updated_since=since)
+                 if t['id'] not in excluded]
+        jobs = list(client.iter_org_jobs(organization_slug, updated_since=since))
+    except requests.exceptions.RequestException as e:
+        logger.error(f"❌ 增量同步失败: {e}，水位线保持不变")
+        return None
+
+    known_tasks = store.query_task_ids() | {t['id'] for t in tasks}
+    jobs = [job for job in jobs if job.get('task_id') in known_tasks and job['task_id'] not in excluded]
+    logger.info(f"✅ 修改过的任务: {len(tasks)} 个，jobs: {len(jobs)} 个")
+
+    _sync_memberships(client, store, organization_slug)
+
+    # 先写jobs：标注下载中断时，这些jobs下次会作为"获取失败"重试
+    store.upsert_jobs(jobs)
+    changed = {job['id'] for job in jobs}
+    retry = [job for job in store.query_jobs_without_summary() if job['id'] not in changed]
+    if retry:
+        logger.info(f"   另有 {len(retry)} 个jobs上次获取标注失败，本次重试")
+
+    scan = jobs + retry
+    summaries = scan_job_annotations(client, scan, on_progress, cache=None if refresh else store)
+    if refresh:
+        store.put_many((job, summaries.get(job['id'])) for job in scan)
+
+    store.replace_tasks(tasks)
+    store.set_meta('synced_at', datetime.now().isoformat(timespec='seconds'))
+    store.set_meta('watermark', _latest_updated_date(jobs, _latest_updated_date(tasks, watermark)))
+
+    return load_state(store, None, excluded)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+标注状态报告 - 汇总/索引文件 + 按chunk的明细文件
+- logs/annotation_status_<时间>.json: 汇总（summary）、明细文件名、按chunk的计数索引（chunks）和job帧位图（jobs），
+  文件很小，菜单显示统计、下次运行复用job结果都只读这个文件
+- logs/annotation_status_<时间>.jsonl.gz: 每行一个chunk {"chunk": ..., "new_images": [...], ...}，
+  按路径顺序边生成边压缩写出；读取时逐行解压，只取需要的字段和chunk
+"""
+import gzip
+import heapq
+import json
+from itertools import groupby, repeat
+from pathlib import Path
+
+# 明细中的图片列表字段
+DETAIL_FIELDS = ('new_images', 'annotated_images', 'not_annotated_images')
+
+# 单个chunk的新图片超过此数量时不导入（数据异常）
+MAX_CHUNK_FILES = 2000
+
+
+def details_file_of(report_file):
+    """汇总文件 → 明细文件路径"""
+    report_file = Path(report_file)
+    return report_file.with_name(f'{report_file.stem}.jsonl.gz')
+
+
+def write_details(details_file, details, chunk_of):
+    """按路径顺序合并各字段的已排序列表，按chunk分行写出gzip JSONL
+
+    Args:
+        details_file: 明细文件路径
+        details: {字段名: 已排序的路径列表}
+        chunk_of: 路径 → chunk ID 的函数
+
+    Returns:
+        chunk索引 {chunk_id: {字段名: 图片数}}（同一chunk的路径不连续时分多行写出，计数累加）
+    """
+    streams = [zip(paths, repeat(field)) for field, paths in details.items()]
+    index = {}
+    with gzip.open(details_file, 'wt', encoding='utf-8') as f:
+        for chunk_id, entries in groupby(heapq.merge(*streams), key=lambda entry: chunk_of(entry[0])):
+            record = {'chunk': chunk_id}
+            for path, field in entries:
+                record.setdefault(field, []).append(path)
+
+            counts = index.setdefault(chunk_id, {})
+            for field in DETAIL_FIELDS:
+                if field in record:
+                    counts[field] = counts.get(field, 0) + len(record[field])
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+    return index
+
+
+def iter_details(details_file, fields=DETAIL_FIELDS, chunks=None):
+    """逐行读取明细，只保留指定字段和chunk：yield (chunk_id, {字段名: 路径列表})"""
+    with gzip.open(details_file, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            chunk_id = record['chunk']
+            if chunks is not None and chunk_id not in chunks:
+                continue
+            yield chunk_id, {field: record[field] for field in fields if field in record}
+
+
+def load_summary(report_file):
+    """读取汇总文件（不读明细）"""
+    with open(report_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def importable_new_images(report_file):
+    """状态报告中可导入的新图片：跳过新图片超过 MAX_CHUNK_FILES 的chunk，只读明细的 new_images 字段"""
+    report = load_summary(report_file)
+    chunks = {
+        chunk_id for chunk_id, counts in report.get('chunks', {}).items()
+        if 0 < counts.get('new_images', 0) <= MAX_CHUNK_FILES
+    }
+    details_file = Path(report_file).with_name(report['details'])
+    for _, record in iter_details(details_file, fields=('new_images',), chunks=chunks):
+        yield from record.get('new_images', [])
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+同步本地状态库 - 从CVAT拉取任务、jobs、组织成员和标注统计，写入 logs/state.db
+同步后 check_progress.py / check_daily_performance.py / check_annotation_status.py 加 --offline 即可秒出报告，不再访问网络
+
+用法:
+    python sync.py                  # 同步组织内全部任务
+    python sync.py 123 456          # 只同步指定任务（冻结任务的标注也重新下载）
+    python sync.py --cloud          # 同时同步云存储（S3/R2）文件清单（只重新列举新分片和未完整的session）
+    python sync.py --full           # 强制完整同步，冻结任务的标注也重新下载（默认有水位线时只同步修改过的任务和jobs；加 --cloud 时完整列举云存储）
+"""
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+
+from cvat_client import BaseCVATClient
+from cloud_storage import DEFAULT_FULL_LISTING_HOURS, DEFAULT_LIST_WORKERS, list_cloud_inventory
+from performance_history import PerformanceHistory, record_state_samples
+from state_store import get_excluded_tasks, get_sync_config, open_state_store, sync_state
+
+# 配置日志
+log_dir = Path('logs')
+log_dir.mkdir(exist_ok=True)
+log_file = log_dir / f'sync_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def sync_cloud_files(config, store, full=False):
+    """同步云存储文件清单到本地库（增量：已完整的session不再重新列举，full=True 时完整列举）"""
+    s3_config = config.get('s3', {})
+    bucket_name = s3_config.get('bucket_name')
+    if not bucket_name:
+        logger.warning("⚠️  未配置 s3.bucket_name，跳过云存储同步")
+        return
+
+    prefix = s3_config.get('prefix', 'test_1000/images/')
+    logger.info(f"\n📁 同步云存储文件列表: {bucket_name}/{prefix}")
+    s3_files = list_cloud_inventory(
+        store,
+        bucket_name=bucket_name,
+        prefix=prefix,
+        aws_access_key_id=s3_config.get('aws_access_key_id'),
+        aws_secret_access_key=s3_config.get('aws_secret_access_key'),
+        region_name=s3_config.get('region', 'us-east-1'),
+        account_id=s3_config.get('account_id'),
+        workers=s3_config.get('list_workers', DEFAULT_LIST_WORKERS),
+        full=full,
+        full_every_hours=s3_config.get('full_listing_hours', DEFAULT_FULL_LISTING_HOURS)
+    )
+    if s3_files is None:
+        logger.error("❌ 云存储文件列表获取失败，本地库保持不变")
+        return
+
+    logger.info(f"✅ 云存储清单: {sum(1 for _ in s3_files)} 个文件")
+
+
+def sync(config_file='config.json', task_ids=None, cloud=False, full=False):
+    """同步主流程"""
+    logger.info("="*60)
+    logger.info("同步本地状态库")
+    logger.info("="*60)
+
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"❌ 配置文件不存在: {config_file}")
+        return False
+
+    organization_slug = config.get('organization', {}).get('slug')
+    client = BaseCVATClient(config['cvat']['url'], config['cvat']['api_key'], config.get('http'))
+    store = open_state_store(config)
+
+    started = time.monotonic()
+    logger.info(f"\n🔄 同步任务、jobs和标注统计...")
+
+    def on_progress(completed, total):
+        if completed % 100 == 0:
+            logger.info(f"      进度: {completed}/{total} jobs")
+
+    state = sync_state(client, store, organization_slug, task_ids, get_excluded_tasks(config),
+                       on_progress, full=full, **get_sync_config(config))
+    if state is None:
+        return False
+
+    failed = sum(1 for summary in state['summaries'].values() if summary is None)
+    logger.info(f"✅ 同步完成: {len(state['tasks'])} 个任务, {len(state['summaries'])} 个jobs, "
+                f"{len(state['members'])} 个成员, 耗时 {time.monotonic() - started:.1f}秒")
+    if failed:
+        logger.warning(f"⚠️  {failed} 个jobs获取标注失败，报告中标记为 unknown，下次同步会重试")
+
+    # 每次同步都给每个job记一个采样点，采样越密，有效速度（排除空闲时段）越准
+    history = PerformanceHistory()
+    changed = record_state_samples(history, state)
+    history.close()
+    logger.info(f"📈 已记录标注进度采样: {changed} 个jobs有变化")
+
+    if cloud:
+        sync_cloud_files(config, store, full)
+
+    logger.info(f"💾 本地状态库: {store.path}")
+    store.close()
+    client.close()
+    return True
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+    cloud = '--cloud' in args
+    full = '--full' in args
+    args = [arg for arg in args if arg not in ('--cloud', '--full')]
+
+    task_ids = None
+    if args:
+        try:
+            task_ids = [int(tid) for tid in args]
+            logger.info(f"同步指定任务: {task_ids}")
+        except ValueError:
+            logger.error("❌ 任务ID必须是数字")
+            logger.info("用法: python sync.py [--cloud] [--full] [task_id1] [task_id2] ...")
+            return
+
+    sync(task_ids=task_ids, cloud=cloud, full=full)
+
+
+if __name__ == "__main__":
+    main()
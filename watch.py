@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+持续监控（watch模式）- 常驻进程，按间隔增量同步并刷新进度和绩效报告
+- CVAT连接池和本地状态库一直保持打开，每轮只同步修改过的任务和jobs（增量同步），
+  没有人标注时每轮只有几个列表请求
+- 每轮结束后原子地重写 logs/daily_report_<日期>.txt、logs/progress_report_latest.json
+  和 reports/daily_performance_<日期>.csv，随时打开都是完整的最新报告
+- 绩效历史和汇总CSV按 history_every_minutes 记录，请求统计同时写出并清空，内存不随运行时长增长
+
+用法:
+    python watch.py                     # 默认每5分钟一轮，Ctrl+C 停止
+    python watch.py --interval 120      # 每2分钟一轮
+    python watch.py 123 456             # 只监控指定任务
+
+配置示例（config.json，可选）:
+    "watch": {
+        "interval_seconds": 300,        # 每轮间隔
+        "history_every_minutes": 60     # 绩效历史、汇总CSV和请求统计的记录间隔
+    }
+"""
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from datetime import datetime
+
+import requests
+
+# 先配置日志：各检查脚本导入时的 basicConfig 不再生效，全部输出到本脚本的日志文件
+log_dir = Path('logs')
+log_dir.mkdir(exist_ok=True)
+log_file = log_dir / f'watch_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.FileHandler(log_file, encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+from cvat_client import BaseCVATClient
+from request_telemetry import telemetry
+from state_store import get_excluded_tasks, get_sync_config, open_state_store, sync_state
+from check_daily_performance import check_daily_performance
+from check_progress import check_progress
+
+DEFAULT_INTERVAL_SECONDS = 300
+DEFAULT_HISTORY_EVERY_MINUTES = 60
+
+
+def watch(config_file='config.json', task_ids=None, interval=None):
+    """常驻循环：增量同步 → 刷新报告 → 等待下一轮，收到 Ctrl+C / SIGTERM 后在本轮结束时退出"""
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"❌ 配置文件不存在: {config_file}")
+        return False
+
+    watch_config = config.get('watch', {}) or {}
+    interval = interval or float(watch_config.get('interval_seconds', DEFAULT_INTERVAL_SECONDS))
+    history_every = float(watch_config.get('history_every_minutes', DEFAULT_HISTORY_EVERY_MINUTES)) * 60
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info("\n🛑 收到停止信号，本轮结束后退出...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    client = BaseCVATClient(config['cvat']['url'], config['cvat']['api_key'], config.get('http'))
+    store = open_state_store(config)
+    organization_slug = config.get('organization', {}).get('slug')
+    sync_config = get_sync_config(config)
+    excluded = get_excluded_tasks(config)
+    progress_report = log_dir / 'progress_report_latest.json'
+
+    logger.info("="*60)
+    logger.info(f"持续监控: 每 {interval:.0f} 秒一轮，每 {history_every / 60:.0f} 分钟记录一次绩效历史")
+    logger.info(f"📝 日志文件: {log_file}")
+    logger.info("="*60)
+
+    last_recorded = None
+    cycle = 0
+    while not stop.is_set():
+        cycle += 1
+        started = time.monotonic()
+        record = last_recorded is None or started - last_recorded >= history_every
+        try:
+            state = sync_state(client, store, organization_slug, task_ids, excluded, **sync_config)
+            if state is not None:
+                check_progress(config_file, task_ids, state=state, report_file=progress_report)
+                check_daily_performance(config_file, task_ids, state=state, record=record)
+                if record:
+                    last_recorded = started
+                    telemetry.write_summary()
+                    telemetry.reset()
+        except requests.exceptions.RequestException as e:
+            # 网络问题不退出，下一轮重试
+            logger.error(f"❌ 第 {cycle} 轮同步失败: {e}")
+        except Exception as e:
+            logger.error(f"❌ 第 {cycle} 轮异常: {e}")
+
+        elapsed = time.monotonic() - started
+        logger.info(f"\n⏱️  第 {cycle} 轮完成，耗时 {elapsed:.1f}秒，{max(interval - elapsed, 0):.0f}秒后开始下一轮")
+        stop.wait(max(interval - elapsed, 0))
+
+    store.close()
+    client.close()
+    logger.info("✅ 持续监控已停止")
+    return True
+
+
+def main():
+    """命令行入口"""
+    args = sys.argv[1:]
+
+    interval = None
+    if '--interval' in args:
+        index = args.index('--interval')
+        try:
+            interval = float(args[index + 1])
+        except (IndexError, ValueError):
+            logger.error("❌ --interval 需要秒数")
+            logger.info("用法: python watch.py [--interval 秒] [task_id1] [task_id2] ...")
+            return
+        del args[index:index + 2]
+
+    task_ids = None
+    if args:
+        try:
+            task_ids = [int(tid) for tid in args]
+            logger.info(f"监控指定任务: {task_ids}")
+        except ValueError:
+            logger.error("❌ 任务ID必须是数字")
+            logger.info("用法: python watch.py [--interval 秒] [task_id1] [task_id2] ...")
+            return
+
+    watch(task_ids=task_ids, interval=interval)
+
+
+if __name__ == "__main__":
+    main()